@@ -0,0 +1,185 @@
+# batch.py
+# Headless εκτέλεση δουλειών χωρίς kivy, π.χ. η ουρά της νύχτας σε server:
+#   python batch.py jobs/ more.jsonl --workers 4 > results.jsonl
+#   cat queue.jsonl | python batch.py - --summary-only
+# Κάθε δουλειά είναι στη μορφή του CutApp.save_job (ένα .json ανά αρχείο,
+# ή μία ανά γραμμή σε .jsonl / stdin). Τα αποτελέσματα βγαίνουν στο stdout
+# ως JSON lines με τη σειρά που τελειώνουν (--ordered: με τη σειρά εισόδου).
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from optimizer import Stock, optimize_cut_materials, optimize_cut_multi_start
+
+
+def iter_jobs(paths):
+    # (id, job) για κάθε δουλειά, χωρίς να διαβάζει όλη την ουρά στη μνήμη.
+    # Ένας φάκελος δίνει τα *.json/*.jsonl του με αλφαβητική σειρά.
+    for path in paths:
+        if path == "-":
+            yield from _iter_lines("<stdin>", sys.stdin)
+        elif os.path.isdir(path):
+            names = sorted(n for n in os.listdir(path) if n.endswith((".json", ".jsonl")))
+            yield from iter_jobs([os.path.join(path, n) for n in names])
+        elif path.endswith(".jsonl"):
+            with open(path, "r", encoding="utf-8") as f:
+                yield from _iter_lines(path, f)
+        else:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    yield path, json.load(f)
+            except (OSError, ValueError) as e:
+                yield path, e
+
+
+def _iter_lines(name, f):
+    for n, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield f"{name}:{n}", json.loads(line)
+        except ValueError as e:
+            yield f"{name}:{n}", e
+
+
+def _sheet_json(sh):
+    out = {
+        "w": sh.sheet_w,
+        "h": sh.sheet_h,
+        "used": sh.get_used_area(),
+        "pieces": [{"name": pp.piece.name, "x": pp.x, "y": pp.y, "w": pp.w,
+                    "h": pp.h, "rotated": pp.rotated} for pp in sh.placed],
+    }
+    if sh.stock is not None:
+        out["stock"] = {"material": sh.stock.material, "cost": sh.stock.cost}
+    if sh.offcut is not None:
+        out["offcut"] = sh.offcut.id
+    if hasattr(sh, "cuts"):
+        out["cuts"] = [{"vertical": c.vertical, "pos": c.pos, "start": c.start,
+                        "length": c.length} for c in sh.cuts()]
+    return out
+
+
+def solve_job(job, attempts=None, seed=None, layouts=True):
+    # Μία δουλειά σε μορφή save_job -> dict αποτελέσματος. Τρέχει στα
+    # processes του pool, άρα κάθε δουλειά μένει σειριακή (workers=1).
+    t = time.perf_counter()
+    K = int(job.get("kerf", 3))
+    att = int(attempts if attempts is not None else job.get("attempts", 10))
+    strat = job.get("strategy", "BSSF")
+    rot = job.get("rot_allowed", True)
+    mode = "guillotine" if job.get("guillotine", False) else "maxrects"
+    stats = {}
+    if job.get("stocks"):
+        stocks = [Stock.from_compact(d) for d in job["stocks"]]
+        by_material = optimize_cut_materials(K, job["pieces"], stocks, strat, rot, att,
+                                             seed=seed, stats=stats, mode=mode)
+        sheets = [sh for shs in by_material.values() for sh in shs]
+    else:
+        W = int(job.get("sheet_w", 2800))
+        H = int(job.get("sheet_h", 2070))
+        pieces = [tuple(p[:3]) for p in job["pieces"]]
+        sheets = optimize_cut_multi_start(W, H, K, pieces, strat, rot, att,
+                                          seed=seed, stats=stats, mode=mode)
+    total = sum(sh.sheet_w * sh.sheet_h for sh in sheets)
+    used = sum(sh.get_used_area() for sh in sheets)
+    res = {
+        "ok": True,
+        "sheets": len(sheets),
+        "utilization": round(used / total, 4) if total else 0.0,
+        "scrap": total - used,
+        "time": round(time.perf_counter() - t, 3),
+        "stats": stats,
+    }
+    if "cost" in stats:
+        res["cost"] = stats["cost"]
+    if layouts:
+        res["layouts"] = [_sheet_json(sh) for sh in sheets]
+    return res
+
+
+def _run(item):
+    job_id, job, attempts, seed, layouts = item
+    try:
+        if isinstance(job, Exception):
+            raise job
+        res = solve_job(job, attempts, seed, layouts)
+    except Exception as e:
+        res = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    out = {"id": job_id}
+    if isinstance(job, dict) and "name" in job:
+        out["name"] = job["name"]
+    out.update(res)
+    return out
+
+
+def run_batch(paths, workers=None, attempts=None, seed=None, layouts=True,
+              ordered=False, out=sys.stdout):
+    # Το πολύ 2 * workers δουλειές στον αέρα, ώστε μια μεγάλη ουρά να μην
+    # φορτώνεται όλη. Επιστρέφει (πλήθος, αποτυχίες).
+    workers = workers or os.cpu_count() or 1
+    items = ((job_id, job, attempts, seed, layouts) for job_id, job in iter_jobs(paths))
+    done = failed = 0
+    pending = {}
+    ready = {}
+    next_out = 0
+
+    def emit(res):
+        nonlocal done, failed
+        done += 1
+        failed += not res["ok"]
+        out.write(json.dumps(res, ensure_ascii=False) + "\n")
+        out.flush()
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        seq = 0
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * workers:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                pending[ex.submit(_run, item)] = seq
+                seq += 1
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                n = pending.pop(fut)
+                if not ordered:
+                    emit(fut.result())
+                    continue
+                ready[n] = fut.result()
+                while next_out in ready:
+                    emit(ready.pop(next_out))
+                    next_out += 1
+    return done, failed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Βελτιστοποίηση δουλειών χωρίς UI")
+    ap.add_argument("paths", nargs="+", help="φάκελοι, .json, .jsonl ή - για stdin")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: CPUs)")
+    ap.add_argument("--attempts", type=int, default=None,
+                    help="attempts για όλες τις δουλειές (αντί για του job)")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--ordered", action="store_true",
+                    help="αποτελέσματα με τη σειρά εισόδου")
+    ap.add_argument("--summary-only", action="store_true",
+                    help="χωρίς τις θέσεις των τεμαχίων")
+    args = ap.parse_args(argv)
+
+    t = time.perf_counter()
+    done, failed = run_batch(args.paths, args.workers, args.attempts, args.seed,
+                             not args.summary_only, args.ordered)
+    print(f"{done} δουλειές, {failed} αποτυχίες, {time.perf_counter() - t:.1f}s",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
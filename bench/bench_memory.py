@@ -0,0 +1,73 @@
+# bench/bench_memory.py
+# Μνήμη και χρόνος για δουλειά ~2000 τεμαχίων:
+#   python bench/bench_memory.py [--pieces 2000] [--seed 2000]
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from optimizer import _flatten_piece_list, _pack_once, _score_sheets  # noqa: E402
+
+
+def make_job(n_pieces: int, seed: int):
+    rng = random.Random(seed)
+    out = []
+    n = 0
+    while n < n_pieces:
+        q = rng.randint(1, 12)
+        out.append((rng.randint(60, 900), rng.randint(60, 700), q))
+        n += q
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pieces", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=2000)
+    args = ap.parse_args(argv)
+
+    job = make_job(args.pieces, args.seed)
+
+    tracemalloc.start()
+    m0, _ = tracemalloc.get_traced_memory()
+    base = _flatten_piece_list(job)
+    m1, _ = tracemalloc.get_traced_memory()
+    base.sort(key=lambda p: p.w * p.h, reverse=True)
+    sheets = _pack_once(list(base), 2800, 2070, 3, "BSSF", True)
+    m2, _ = tracemalloc.get_traced_memory()
+
+    t = time.perf_counter()
+    snap_deep = deepcopy(sheets)
+    t_deep = time.perf_counter() - t
+    m3, _ = tracemalloc.get_traced_memory()
+    t = time.perf_counter()
+    snap_copy = [sh.copy() for sh in sheets]
+    t_copy = time.perf_counter() - t
+    m4, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    t = time.perf_counter()
+    sheets = _pack_once(list(base), 2800, 2070, 3, "BSSF", True)
+    t_pack = time.perf_counter() - t
+    t = time.perf_counter()
+    for _ in range(100):
+        _score_sheets(sheets)
+    t_score = time.perf_counter() - t
+
+    print(f"pieces:           {len(base)} -> {len(sheets)} sheets")
+    print(f"piece objects:    {(m1 - m0) / 1e3:8.0f} KB")
+    print(f"layouts:          {(m2 - m1) / 1e3:8.0f} KB")
+    print(f"_pack_once:       {t_pack * 1000:8.0f} ms")
+    print(f"_score_sheets:    {t_score * 10:8.2f} ms/call")
+    print(f"deepcopy snapshot:{t_deep * 1000:8.0f} ms {(m3 - m2) / 1e3:8.0f} KB")
+    print(f"copy() snapshot:  {t_copy * 1000:8.0f} ms {(m4 - m3) / 1e3:8.0f} KB")
+    del snap_deep, snap_copy
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# bench/bench_optimizer.py
+# Χρόνοι ανά στάδιο και ποιότητα του optimizer πάνω στις δουλειές του
+# bench/instances.py:
+#   python bench/bench_optimizer.py [--attempts 10] [--mode guillotine] --save base.json
+#   python bench/bench_optimizer.py --compare base.json [--time-tol 0.2] [--sheet-tol 0]
+# Με --compare βγαίνει με κωδικό 1 αν κάποια δουλειά χρειάζεται περισσότερα
+# φύλλα ή είναι πιο αργή πέρα από το όριο. Οι χρόνοι συγκρίνονται μόνο
+# με baseline από το ίδιο μηχάνημα.
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from instances import GENERATORS, suite  # noqa: E402
+from optimizer import (  # noqa: E402
+    _attempt_rng, _flatten_piece_list, _global_compactor, _global_refine_heavy,
+    _layout_for, _pack_once, _score_sheets, _sheet_lower_bound, _shuffle_area_bands,
+    optimize_cut_multi_start,
+)
+
+STAGES = ("pack", "compact", "refine")
+# κάτω από αυτή τη διαφορά (δευτερόλεπτα) ο χρόνος θεωρείται θόρυβος
+MIN_TIME_DELTA = 0.01
+
+
+def run_stages(job, attempts: int, seed: int, strategy: str, mode: str):
+    # Τα στάδια ενός attempt όπως στο _run_attempt, χωρίς cache, ώστε να
+    # μετριέται η πραγματική δουλειά κάθε σταδίου.
+    W, H, K, rot = job["W"], job["H"], job["K"], job["rot"]
+    layout = _layout_for(mode)
+    base = _flatten_piece_list(job["pieces"])
+    times = dict.fromkeys(STAGES, 0.0)
+    sheets_after = {st: [] for st in STAGES}
+    for a in range(attempts):
+        rng = _attempt_rng(seed, a)
+        pieces = list(base)
+        _shuffle_area_bands(pieces, rng)
+        t = time.perf_counter()
+        sheets = _pack_once(pieces, W, H, K, strategy, rot, layout=layout)
+        t1 = time.perf_counter()
+        # ο compactor αλλάζει τα sheets επί τόπου
+        sheets_after["pack"].append(len(sheets))
+        _global_compactor(sheets, strategy, rot)
+        t2 = time.perf_counter()
+        sheets_after["compact"].append(len(sheets))
+        _global_refine_heavy(sheets, strategy, rot, W, H, K, rounds=3, rng=rng)
+        t3 = time.perf_counter()
+        sheets_after["refine"].append(len(sheets))
+        times["pack"] += t1 - t
+        times["compact"] += t2 - t1
+        times["refine"] += t3 - t2
+    return times, {st: statistics.mean(v) for st, v in sheets_after.items()}
+
+
+def bench_job(job, args):
+    best = None
+    for _ in range(args.repeat):
+        stage_t, stage_q = run_stages(job, args.attempts, args.seed,
+                                      args.strategy, args.mode)
+        stats = {}
+        t = time.perf_counter()
+        sheets = optimize_cut_multi_start(
+            job["W"], job["H"], job["K"], job["pieces"], args.strategy, job["rot"],
+            attempts=args.attempts, seed=args.seed, mode=args.mode, stats=stats,
+            profile=args.profile,
+        )
+        t_full = time.perf_counter() - t
+        # ο καλύτερος από τους repeat χρόνους, η ποιότητα είναι ίδια
+        if best is None or t_full < best["time"]:
+            n, scrap = _score_sheets(sheets)
+            base = _flatten_piece_list(job["pieces"])
+            best = {
+                "time": t_full,
+                "stages": stage_t,
+                "stage_sheets": stage_q,
+                "sheets": n,
+                "scrap": scrap,
+                "utilization": 1 - scrap / (n * job["W"] * job["H"]) if n else 0.0,
+                "lower_bound": _sheet_lower_bound(base, job["W"], job["H"], job["rot"]),
+                "pieces": len(base),
+                "stats": stats,
+            }
+    return best
+
+
+def compare(results, baseline, time_tol: float, sheet_tol: int):
+    failures = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if b is None:
+            continue
+        if r["sheets"] > b["sheets"] + sheet_tol:
+            failures.append(f"{name}: φύλλα {b['sheets']} -> {r['sheets']}")
+        if (r["time"] > b["time"] * (1 + time_tol)
+                and r["time"] - b["time"] > MIN_TIME_DELTA):
+            failures.append(f"{name}: χρόνος {b['time']:.3f}s -> {r['time']:.3f}s")
+    t_new = sum(r["time"] for n, r in results.items() if n in baseline)
+    t_old = sum(baseline[n]["time"] for n in results if n in baseline)
+    if t_old and t_new > t_old * (1 + time_tol):
+        failures.append(f"σύνολο: χρόνος {t_old:.3f}s -> {t_new:.3f}s")
+    return failures
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--attempts", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--seeds", default="1,2,3", help="seeds των generators")
+    ap.add_argument("--families", default=",".join(GENERATORS))
+    ap.add_argument("--strategy", default="BSSF")
+    ap.add_argument("--mode", default="maxrects")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--profile", action="store_true",
+                    help="μετρητές των hot paths στο --save (πιο αργό)")
+    ap.add_argument("--save")
+    ap.add_argument("--compare")
+    ap.add_argument("--time-tol", type=float, default=0.20)
+    ap.add_argument("--sheet-tol", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    jobs = suite(tuple(int(s) for s in args.seeds.split(",")),
+                 args.families.split(","))
+    results = {}
+    print(f"{'job':16} {'parts':>5} {'sheets':>6} {'lb':>3} {'util':>6} "
+          f"{'total':>8} {'pack':>8} {'compact':>8} {'refine':>8}")
+    for job in jobs:
+        r = bench_job(job, args)
+        results[job["name"]] = r
+        st = r["stages"]
+        print(f"{job['name']:16} {r['pieces']:5} {r['sheets']:6} {r['lower_bound']:3} "
+              f"{r['utilization'] * 100:5.1f}% {r['time'] * 1000:6.0f}ms "
+              f"{st['pack'] * 1000:6.0f}ms {st['compact'] * 1000:6.0f}ms "
+              f"{st['refine'] * 1000:6.0f}ms")
+    total = sum(r["time"] for r in results.values())
+    sheets = sum(r["sheets"] for r in results.values())
+    print(f"σύνολο: {sheets} φύλλα, {total:.2f}s")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        failures = compare(results, baseline, args.time_tol, args.sheet_tol)
+        for line in failures:
+            print("REGRESSION", line)
+        if failures:
+            return 1
+        print("OK: καμία χειροτέρευση πέρα από τα όρια")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
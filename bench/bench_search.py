@@ -0,0 +1,75 @@
+# bench/bench_search.py
+# optimize_cut_search έναντι του loop του optimize_cut_multi_start με τον
+# ίδιο χρόνο ανά δουλειά (το loop τρέχει attempts ως το deadline):
+#   python bench/bench_search.py [--time 2] [--runs 1,2] [--mode guillotine]
+# Βγαίνει με κωδικό 1 αν η αναζήτηση χρειάζεται περισσότερα φύλλα σε κάποια δουλειά.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from instances import GENERATORS, suite  # noqa: E402
+from optimizer import _score_sheets, optimize_cut_multi_start, optimize_cut_search  # noqa: E402
+
+
+def loop(job, budget: float, seed: int, strategy: str, mode: str):
+    deadline = time.monotonic() + budget
+    stats = {}
+    # exact=False: συγκρίνεται μόνο το loop των attempts
+    sheets = optimize_cut_multi_start(
+        job["W"], job["H"], job["K"], job["pieces"], strategy, job["rot"],
+        attempts=10 ** 9, seed=seed, stop=lambda: time.monotonic() >= deadline,
+        stats=stats, mode=mode, exact=False,
+    )
+    return _score_sheets(sheets), stats
+
+
+def search(job, budget: float, seed: int, strategy: str, mode: str):
+    stats = {}
+    sheets = optimize_cut_search(
+        job["W"], job["H"], job["K"], job["pieces"], strategy, job["rot"],
+        time_budget=budget, seed=seed, stats=stats, mode=mode,
+    )
+    return _score_sheets(sheets), stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--time", type=float, default=2.0, help="δευτερόλεπτα ανά δουλειά")
+    ap.add_argument("--runs", default="1,2", help="seeds του optimize")
+    ap.add_argument("--seeds", default="1,2,3", help="seeds των generators")
+    ap.add_argument("--families", default=",".join(GENERATORS))
+    ap.add_argument("--strategy", default="BSSF")
+    ap.add_argument("--mode", default="maxrects")
+    args = ap.parse_args(argv)
+
+    jobs = suite(tuple(int(s) for s in args.seeds.split(",")),
+                 args.families.split(","))
+    runs = [int(s) for s in args.runs.split(",")]
+    worse = []
+    totals = [0, 0]
+    print(f"{'job':16} {'lb':>3} {'loop':>5} {'search':>6} {'attempts':>8} "
+          f"{'evals':>6} {'reuse':>6}")
+    for job in jobs:
+        for seed in runs:
+            (n_loop, _), st_loop = loop(job, args.time, seed, args.strategy, args.mode)
+            (n_search, _), st = search(job, args.time, seed, args.strategy, args.mode)
+            totals[0] += n_loop
+            totals[1] += n_search
+            # ομάδες που δεν χρειάστηκε να ξαναμπούν χάρη στα checkpoints
+            reuse = 1 - st["runs_placed"] / st["runs_total"] if st["runs_total"] else 0.0
+            print(f"{job['name']:16} {st['lower_bound']:3} {n_loop:5} {n_search:6} "
+                  f"{st_loop['attempts_run']:8} {st['evals']:6} {reuse * 100:5.0f}%")
+            if n_search > n_loop:
+                worse.append(f"{job['name']} (seed {seed}): {n_loop} -> {n_search}")
+    print(f"σύνολο φύλλων: loop {totals[0]}, search {totals[1]}")
+    for line in worse:
+        print("WORSE", line)
+    return 1 if worse else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
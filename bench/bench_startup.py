@@ -0,0 +1,66 @@
+# bench/bench_startup.py
+# Χρόνος ως το πρώτο frame του CutApp, σε νέο process κάθε φορά:
+#   python bench/bench_startup.py [--runs 5] [--main άλλο/main.py]
+# Το app τυπώνει το first_frame_ms και κλείνει (CUTAPP_STARTUP_EXIT=1).
+# Για σύγκριση πριν/μετά, --main σε main.py άλλου checkout (π.χ. git worktree).
+# Μετράει επίσης το import των modules που δεν φορτώνονται πια στο startup,
+# που τρέχει και χωρίς kivy.
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY = ("optimizer", "render", "kivy.uix.image")
+
+
+def first_frame_ms(main_py: str, timeout: float = 60.0):
+    env = dict(os.environ, CUTAPP_STARTUP_EXIT="1", KIVY_NO_ARGS="1",
+               KIVY_NO_CONSOLELOG="1")
+    proc = subprocess.run([sys.executable, main_py], cwd=os.path.dirname(main_py),
+                          env=env, capture_output=True, text=True, timeout=timeout)
+    m = re.search(r"STARTUP first_frame_ms=([\d.]+)", proc.stdout)
+    if m is None:
+        raise RuntimeError((proc.stderr or proc.stdout).strip().splitlines()[-1:]
+                           or [f"exit {proc.returncode}"])
+    return float(m.group(1))
+
+
+def import_ms(module: str):
+    code = ("import time; t = time.perf_counter(); import " + module +
+            "; print((time.perf_counter() - t) * 1000)")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    return float(proc.stdout.strip())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--main", default=os.path.join(ROOT, "main.py"))
+    args = ap.parse_args(argv)
+
+    print("import (ms, median):")
+    for mod in LAZY:
+        times = [import_ms(mod) for _ in range(args.runs)]
+        if None in times:
+            print(f"  {mod:16} δεν υπάρχει")
+            continue
+        print(f"  {mod:16} {statistics.median(times):7.1f}")
+
+    try:
+        times = [first_frame_ms(os.path.abspath(args.main)) for _ in range(args.runs)]
+    except Exception as e:
+        print(f"first frame: δεν μετρήθηκε ({e})")
+        return 1
+    print(f"first frame (ms): median {statistics.median(times):.1f}, "
+          f"min {min(times):.1f}, max {max(times):.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
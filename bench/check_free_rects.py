@@ -0,0 +1,208 @@
+# bench/check_free_rects.py
+# Έλεγχος ότι το SheetLayout δίνει τις ίδιες θέσεις και τον ίδιο ελεύθερο
+# χώρο με τον αρχικό αλγόριθμο (πλήρες _merge_free_rects σε κάθε
+# τοποθέτηση), που είναι αντιγραμμένος εδώ ως αναφορά:
+#   python bench/check_free_rects.py [--seeds 300] [--pieces 60]
+# Μετά από κάθε try_place_piece συγκρίνονται η θέση και τα free_rects
+# (με τη σειρά τους), με το NumPy path κλειστό και, αν υπάρχει NumPy,
+# ανοιχτό για όλα τα μεγέθη. Βγαίνει με κωδικό 1 στην πρώτη διαφορά.
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import optimizer  # noqa: E402
+from optimizer import Piece, SheetLayout  # noqa: E402
+
+
+class _Rect:
+    __slots__ = ("x", "y", "w", "h")
+
+    def __init__(self, x, y, w, h):
+        self.x, self.y, self.w, self.h = x, y, w, h
+
+
+def _intersects(a, b):
+    return not (a.x + a.w <= b.x or b.x + b.w <= a.x or
+                a.y + a.h <= b.y or b.y + b.h <= a.y)
+
+
+def _contains(a, b):
+    return (b.x >= a.x and b.y >= a.y and
+            b.x + b.w <= a.x + a.w and b.y + b.h <= a.y + a.h)
+
+
+class ReferenceSheet:
+    # ο SheetLayout πριν από το ευρετήριο των free rects, χωρίς αλλαγές στη λογική
+    def __init__(self, W, H, K, strategy, rot):
+        self.kerf, self.strategy, self.allow_rotation = K, strategy, rot
+        self.placed = []  # (x, y, w, h)
+        self.free_rects = [_Rect(0, 0, W, H)]
+
+    def _score(self, fr_w, fr_h, pw, ph):
+        lh, lw = fr_h - ph, fr_w - pw
+        short, long_, area = min(lh, lw), max(lh, lw), lh * lw
+        if self.strategy == "BAF":
+            return (area, short)
+        if self.strategy == "BLSF":
+            return (long_, short)
+        return (short, area)
+
+    def _strip_bias(self, fr, pw):
+        penalty = 10_000
+        if fr.x == 0:
+            penalty -= 200
+        if any(x == fr.x and w == pw and y + h <= fr.y + 1 for x, y, w, h in self.placed):
+            penalty -= 5000
+        return penalty - min(fr.y, 200)
+
+    def try_place_piece(self, w, h):
+        orientations = [False, True] if self.allow_rotation else [False]
+        exact = None
+        for i, fr in enumerate(self.free_rects):
+            for rot in orientations:
+                pw, ph = (h, w) if rot else (w, h)
+                if pw <= fr.w and ph <= fr.h and (pw == fr.w or ph == fr.h):
+                    cand = (fr.y, fr.x, i, rot, fr.x, fr.y, pw, ph)
+                    if exact is None or cand < exact:
+                        exact = cand
+        if exact is not None:
+            _, _, i, rot, x, y, pw, ph = exact
+            self._place_and_split(i, x, y, pw, ph)
+            return (x, y, rot)
+        best = None
+        for i, fr in enumerate(self.free_rects):
+            for rot in orientations:
+                pw, ph = (h, w) if rot else (w, h)
+                if pw <= fr.w and ph <= fr.h:
+                    s = self._score(fr.w, fr.h, pw, ph)
+                    cand = (s[0], s[1], fr.y, fr.x, self._strip_bias(fr, pw),
+                            i, rot, fr.x, fr.y, pw, ph)
+                    if best is None or cand < best:
+                        best = cand
+        if best is None:
+            return None
+        i, rot, x, y, pw, ph = best[5:]
+        self._place_and_split(i, x, y, pw, ph)
+        return (x, y, rot)
+
+    def _place_and_split(self, i, x, y, pw, ph):
+        self.placed.append((x, y, pw, ph))
+        fr = self.free_rects.pop(i)
+        kx = self.kerf if x + pw < fr.x + fr.w else 0
+        ky = self.kerf if y + ph < fr.y + fr.h else 0
+        rx = x + pw + kx
+        if fr.x + fr.w - rx > 0:
+            self.free_rects.append(_Rect(rx, fr.y, fr.x + fr.w - rx, fr.h))
+        by = y + ph + ky
+        if fr.y + fr.h - by > 0:
+            self.free_rects.append(_Rect(fr.x, by, fr.w, fr.y + fr.h - by))
+        self._prune(_Rect(x, y, pw, ph))
+        self._merge()
+
+    def _prune(self, used):
+        out = []
+        for fr in self.free_rects:
+            if not _intersects(fr, used):
+                out.append(fr)
+                continue
+            if used.y > fr.y:
+                out.append(_Rect(fr.x, fr.y, fr.w, used.y - fr.y))
+            if used.y + used.h < fr.y + fr.h:
+                out.append(_Rect(fr.x, used.y + used.h, fr.w,
+                                 fr.y + fr.h - (used.y + used.h)))
+            top = max(fr.y, used.y)
+            bottom = min(fr.y + fr.h, used.y + used.h)
+            if used.x > fr.x:
+                out.append(_Rect(fr.x, top, used.x - fr.x, bottom - top))
+            if used.x + used.w < fr.x + fr.w:
+                out.append(_Rect(used.x + used.w, top,
+                                 fr.x + fr.w - (used.x + used.w), bottom - top))
+        self.free_rects = [r for r in out if r.w > 0 and r.h > 0]
+
+    def _merge(self):
+        rects = self.free_rects
+        rects = [a for i, a in enumerate(rects)
+                 if not any(i != j and _contains(b, a) for j, b in enumerate(rects))]
+        merged = True
+        while merged:
+            merged = False
+            out = []
+            used = [False] * len(rects)
+            for i, a in enumerate(rects):
+                if used[i]:
+                    continue
+                for j in range(i + 1, len(rects)):
+                    if used[j]:
+                        continue
+                    b = rects[j]
+                    if a.y == b.y and a.h == b.h and (a.x + a.w == b.x or b.x + b.w == a.x):
+                        out.append(_Rect(min(a.x, b.x), a.y, a.w + b.w, a.h))
+                    elif a.x == b.x and a.w == b.w and (a.y + a.h == b.y or b.y + b.h == a.y):
+                        out.append(_Rect(a.x, min(a.y, b.y), a.w, a.h + b.h))
+                    else:
+                        continue
+                    used[i] = used[j] = merged = True
+                    break
+                if not used[i]:
+                    out.append(a)
+                    used[i] = True
+            rects = out
+        self.free_rects = rects
+
+
+def _free(rects):
+    return [(r.x, r.y, r.w, r.h) for r in rects]
+
+
+def check_seed(seed: int, n_pieces: int):
+    # None αν συμφωνούν, αλλιώς περιγραφή της πρώτης διαφοράς
+    rng = random.Random(seed)
+    W, H = rng.choice([(2800, 2070), (2440, 1220), (1000, 1000)])
+    K = rng.choice([0, 3, 5])
+    strategy = rng.choice(["BSSF", "BAF", "BLSF"])
+    rot = rng.random() < 0.7
+    # λίγα είδη με επαναλήψεις, ώστε να υπάρχουν exact fits και στήλες
+    kinds = [(rng.randint(30, W // 3), rng.randint(30, H // 3)) for _ in range(rng.randint(2, 12))]
+    ref = ReferenceSheet(W, H, K, strategy, rot)
+    sh = SheetLayout(W, H, K, strategy, rot)
+    for n in range(n_pieces):
+        w, h = rng.choice(kinds)
+        want = ref.try_place_piece(w, h)
+        ok = sh.try_place_piece(Piece(w, h))
+        got = (sh.placed[-1].x, sh.placed[-1].y, sh.placed[-1].rotated) if ok else None
+        if got != want:
+            return f"seed {seed}, τεμάχιο {n} ({w}x{h}): θέση {got} αντί για {want}"
+        if _free(sh.free_rects) != _free(ref.free_rects):
+            return f"seed {seed}, τεμάχιο {n} ({w}x{h}): διαφορετικά free_rects"
+    return None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seeds", type=int, default=300)
+    ap.add_argument("--pieces", type=int, default=60, help="τοποθετήσεις ανά seed")
+    args = ap.parse_args(argv)
+
+    paths = [("loop", 10 ** 9)]
+    if optimizer._np is not None:
+        paths.append(("numpy", 0))
+    old = optimizer.NUMPY_MIN_FREE_RECTS
+    failed = False
+    try:
+        for name, threshold in paths:
+            optimizer.NUMPY_MIN_FREE_RECTS = threshold
+            errors = [e for e in (check_seed(s, args.pieces) for s in range(args.seeds)) if e]
+            print(f"{name}: {args.seeds - len(errors)}/{args.seeds} seeds ίδια")
+            for e in errors[:5]:
+                print("DIFF", e)
+            failed = failed or bool(errors)
+    finally:
+        optimizer.NUMPY_MIN_FREE_RECTS = old
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# bench/instances.py
+# Σταθερά (seeded) σετ δουλειών για τα benchmarks. Κάθε generator δίνει
+# dict με W, H, K, rot και pieces σε μορφή [(w, h, q), ...] όπως το
+# piece_list του optimize_cut_multi_start.
+import random
+
+SHEET_W = 2800
+SHEET_H = 2070
+
+
+def _job(name, pieces, K=3, rot=True, W=SHEET_W, H=SHEET_H):
+    return {"name": name, "W": W, "H": H, "K": K, "rot": rot, "pieces": pieces}
+
+
+def kitchen(seed: int):
+    # κουτιά κουζίνας: λίγα είδη (πλαϊνά, πάτοι, ράφια, πόρτες) με
+    # ποσότητες, πάνω σε τυποποιημένα βάθη και πλάτη
+    rng = random.Random(seed)
+    pieces = []
+    for _ in range(rng.randint(6, 12)):
+        width = rng.choice([300, 400, 450, 500, 600, 800, 900])
+        height = rng.choice([720, 720, 580, 350])
+        depth = rng.choice([560, 580, 320])
+        n = rng.randint(1, 3)
+        pieces.append((height, depth, 2 * n))          # πλαϊνά
+        pieces.append((width - 36, depth, 2 * n))      # πάτος / καπάκι
+        pieces.append((width - 36, depth - 20, n))     # ράφι
+        pieces.append((width - 4, height - 4, n))      # πόρτα
+    return _job(f"kitchen-{seed}", pieces)
+
+
+def shelving(seed: int):
+    # ραφιέρες: μακριά στενά κομμάτια σε μεγάλες ποσότητες
+    rng = random.Random(seed)
+    pieces = []
+    for _ in range(rng.randint(3, 6)):
+        length = rng.randint(600, 2400)
+        depth = rng.choice([250, 300, 350, 400])
+        pieces.append((length, depth, rng.randint(4, 16)))
+        pieces.append((rng.randint(1200, 2000), depth, 2))
+    return _job(f"shelving-{seed}", pieces)
+
+
+def many_tiny(seed: int):
+    # πολλά μικρά και διαφορετικά κομμάτια
+    rng = random.Random(seed)
+    pieces = [(rng.randint(40, 300), rng.randint(40, 300), rng.randint(1, 6))
+              for _ in range(rng.randint(150, 250))]
+    return _job(f"many-tiny-{seed}", pieces)
+
+
+def few_huge(seed: int):
+    # λίγα κομμάτια κοντά στο μέγεθος του φύλλου
+    rng = random.Random(seed)
+    pieces = [(rng.randint(1000, 2700), rng.randint(800, 2000), rng.randint(1, 2))
+              for _ in range(rng.randint(4, 10))]
+    return _job(f"few-huge-{seed}", pieces)
+
+
+def mixed(seed: int):
+    # γενικό μείγμα, με kerf και rotation που αλλάζουν ανά seed
+    rng = random.Random(seed)
+    pieces = [(rng.randint(80, 900), rng.randint(60, 700), rng.randint(1, 8))
+              for _ in range(rng.randint(20, 60))]
+    return _job(f"mixed-{seed}", pieces, K=[0, 3, 5][seed % 3], rot=seed % 4 != 0)
+
+
+GENERATORS = {
+    "kitchen": kitchen,
+    "shelving": shelving,
+    "many-tiny": many_tiny,
+    "few-huge": few_huge,
+    "mixed": mixed,
+}
+
+
+def suite(seeds=(1, 2, 3), families=None):
+    # όλες οι δουλειές του benchmark, σε σταθερή σειρά
+    out = []
+    for fam in families or GENERATORS:
+        for s in seeds:
+            out.append(GENERATORS[fam](s))
+    return out
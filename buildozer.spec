@@ -4,6 +4,7 @@ package.name = cutoptimizer
 package.domain = org.cutshop
 source.dir = .
 source.include_exts = py,kv
+source.exclude_dirs = bench
 version = 0.1
 # προαιρετικό icon: icon.filename = icons/app_icon.png
 
@@ -1,11 +1,29 @@
+import time
+_T0 = time.perf_counter()   # αρχή του startup, βλ. _on_first_frame
+
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.lang import Builder
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.metrics import dp
-import os, json, traceback
+import os, json, shutil, threading, traceback
+
+# Τα optimizer (με numpy αν υπάρχει), render (Pillow) και kivy.uix.image
+# φορτώνονται όταν χρειαστούν, όχι στο startup. Μετά το πρώτο frame ένα
+# background thread κάνει import τα δύο πρώτα, ώστε συνήθως να είναι
+# έτοιμα πριν πατηθεί το Υπολόγισε.
+_PREWARM = ("optimizer", "render")
+
 
-from optimizer import optimize_cut_multi_start
+def _prewarm():
+    import importlib
+
+    for name in _PREWARM:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass   # το ίδιο λάθος θα βγει με report στο κανονικό import
 
 
 class CutApp(App):
@@ -21,8 +39,42 @@ class CutApp(App):
             self.root_widget = root
         self.pieces = []
         self._panels = []
+        self._opt_thread = None
+        self._opt_cancel = threading.Event()
+        # τελευταίο πλάνο και πόσες γραμμές του self.pieces καλύπτει, για το
+        # add_to_plan
+        self._sheets = []
+        self._planned = 0
+        self._planning = 0
+        self._inventory = None
+        # φύλλα ανά υλικό από το job.json: [[w, h, κόστος, υλικό, πάχος], ...]
+        # και τεμάχια [w, h, q, υλικό]. Χωρίς αυτά ισχύουν τα πεδία W/H.
+        self._stocks = []
+        # render σε δικό του thread. Το _render_gen αλλάζει σε κάθε νέο
+        # render, ώστε ό,τι έρχεται από παλιό να αγνοείται.
+        self._render_thread = None
+        self._render_gen = 0
+        self._exported = []
+        # CUTAPP_PROFILE=1: μετρητές/χρόνοι του optimizer στο debug_log.txt
+        self.profile = os.environ.get("CUTAPP_PROFILE") == "1"
         return self.root_widget
 
+    def on_start(self):
+        from kivy.core.window import Window
+
+        Window.bind(on_flip=self._on_first_frame)
+
+    def _on_first_frame(self, window):
+        window.unbind(on_flip=self._on_first_frame)
+        ms = (time.perf_counter() - _T0) * 1000
+        self._append_log(f"[STARTUP] first_frame_ms={ms:.0f}")
+        # CUTAPP_STARTUP_EXIT=1: μέτρηση από το bench/bench_startup.py
+        if os.environ.get("CUTAPP_STARTUP_EXIT") == "1":
+            print(f"STARTUP first_frame_ms={ms:.1f}", flush=True)
+            self.stop()
+            return
+        threading.Thread(target=_prewarm, daemon=True).start()
+
     def set_status(self, txt):
         self.root_widget.ids.summary_label.text = txt[:200]
 
@@ -38,10 +90,12 @@ class CutApp(App):
         except:
             pass
 
-    def report(self, stage, detail=""):
+    def report(self, stage, detail="", trace=None):
         short = f"ERR:{stage}"
         self.set_status(short)
-        full = f"[{stage}] {detail}\nTRACE:\n{traceback.format_exc()}"
+        if trace is None:
+            trace = traceback.format_exc()
+        full = f"[{stage}] {detail}\nTRACE:\n{trace}"
         self.set_debug(full)
         self._append_log(full)
         return
@@ -64,6 +118,8 @@ class CutApp(App):
 
     def clear_pieces(self, *a):
         self.pieces = []
+        self._sheets = []
+        self._planned = 0
         self.root_widget.ids.piece_list.clear_widgets()
         self.set_status("Λίστα άδεια.")
 
@@ -71,6 +127,49 @@ class CutApp(App):
         os.makedirs(self.user_data_dir, exist_ok=True)
         return os.path.join(self.user_data_dir, "job.json")
 
+    def _offcuts_path(self):
+        os.makedirs(self.user_data_dir, exist_ok=True)
+        return os.path.join(self.user_data_dir, "offcuts.json")
+
+    def inventory(self):
+        # η αποθήκη ρεταλιών φορτώνεται μία φορά, κοινή για όλες τις δουλειές
+        if self._inventory is None:
+            self._inventory, err = self._read_inventory()
+            if err:
+                self.report("LOAD_OFFCUTS", err, "")
+        return self._inventory
+
+    def _read_inventory(self):
+        # χωρίς UI, ώστε να τρέχει και στο thread του optimizer (το import
+        # του optimizer/NumPy δεν μπαίνει στο UI thread)
+        from optimizer import OffcutInventory
+
+        try:
+            with open(self._offcuts_path(), "r", encoding="utf-8") as f:
+                return OffcutInventory.from_json(json.load(f)), None
+        except FileNotFoundError:
+            return OffcutInventory(), None
+        except Exception as e:
+            return OffcutInventory(), str(e)
+
+    def harvest_offcuts(self, *a):
+        # Το πλάνο κόπηκε: τα ρετάλια που χρησιμοποίησε φεύγουν από την
+        # αποθήκη και μπαίνουν τα περισσεύματά του.
+        if not self._sheets:
+            self.set_status("Δεν υπάρχει πλάνο.")
+            return
+        inv = self.inventory()
+        try:
+            added = inv.harvest(self._sheets)
+            with open(self._offcuts_path(), "w", encoding="utf-8") as f:
+                json.dump(inv.to_json(), f)
+        except Exception as e:
+            return self.report("SAVE_OFFCUTS", str(e))
+        # ένα πλάνο δεν μαζεύεται δύο φορές
+        self._sheets = []
+        self._planned = 0
+        self.set_status(f"Ρετάλια: +{len(added)}, σύνολο {len(inv)}")
+
     def save_job(self, *a):
         ids = self.root_widget.ids
         job = {
@@ -80,8 +179,15 @@ class CutApp(App):
             "attempts": ids.attempts.text,
             "rot_allowed": ids.rot_allowed.active,
             "strategy": ids.strategy.text,
+            "guillotine": ids.guillotine.active,
             "pieces": self.pieces,
         }
+        if self._stocks:
+            job["stocks"] = [st.to_compact() for st in self._stocks]
+        if self._sheets:
+            from optimizer import layouts_to_json
+
+            job["plan"] = dict(layouts_to_json(self._sheets), planned=self._planned)
         try:
             with open(self._job_path(), "w", encoding="utf-8") as f:
                 json.dump(job, f, ensure_ascii=False, indent=2)
@@ -102,14 +208,34 @@ class CutApp(App):
         ids.attempts.text = str(job.get("attempts", "10"))
         ids.strategy.text = job.get("strategy", "BSSF")
         ids.rot_allowed.active = job.get("rot_allowed", True)
+        ids.guillotine.active = job.get("guillotine", False)
         self.pieces = job.get("pieces", [])
+        from optimizer import Stock, layouts_from_json
+
+        try:
+            self._stocks = [Stock.from_compact(d) for d in job.get("stocks", [])]
+        except Exception as e:
+            self._stocks = []
+            self.report("LOAD_STOCKS", str(e))
+        plan = job.get("plan")
+        try:
+            self._sheets = layouts_from_json(plan) if plan else []
+            self._planned = plan.get("planned", 0) if plan else 0
+        except Exception as e:
+            self._sheets, self._planned = [], 0
+            self.report("LOAD_PLAN", str(e))
         plist = ids.piece_list
         plist.clear_widgets()
-        for (w, h, q) in self.pieces:
-            plist.add_widget(Label(text=f"{w}x{h}x{q}", size_hint_y=None, height=dp(22)))
+        for p in self.pieces:
+            text = "x".join(str(v) for v in p[:3]) + (f" {p[3]}" if len(p) > 3 else "")
+            plist.add_widget(Label(text=text, size_hint_y=None, height=dp(22)))
+        if self._sheets:
+            self.show_sheets(self._sheets)
         self.set_status("Φορτώθηκε")
 
     def run_optimizer(self, *a):
+        if self._opt_thread is not None:
+            return
         ids = self.root_widget.ids
         try:
             W = int(ids.sheet_w.text)
@@ -118,21 +244,157 @@ class CutApp(App):
             att = int(ids.attempts.text)
             strat = ids.strategy.text
             rot = ids.rot_allowed.active
+            mode = "guillotine" if ids.guillotine.active else "maxrects"
         except Exception as e:
             return self.report("STAGE1_INPUT", str(e))
         if not self.pieces:
             self.set_status("Δεν έχεις τεμάχια.")
             return
 
+        # ο optimizer τρέχει σε δικό του thread, το UI ενημερώνεται μόνο
+        # μέσα από το Clock
+        self._opt_cancel.clear()
+        self._planning = len(self.pieces)
+        self._set_running(True)
+        self.set_status("Υπολογισμός...")
+        self._opt_thread = threading.Thread(
+            target=self._optimizer_worker,
+            args=(W, H, K, list(self.pieces), strat, rot, att, mode,
+                  list(self._stocks)),
+            daemon=True,
+        )
+        self._opt_thread.start()
+
+    def add_to_plan(self, *a):
+        # Τα τεμάχια που προστέθηκαν μετά το τελευταίο πλάνο μπαίνουν στα
+        # κενά των φύλλων του, χωρίς να μετακινηθούν τα υπάρχοντα. Χωρίς
+        # πλάνο, ή με άλλο φύλλο/kerf/mode, τρέχει κανονικά ο optimizer.
+        if self._opt_thread is not None:
+            return
+        ids = self.root_widget.ids
+        try:
+            W = int(ids.sheet_w.text)
+            H = int(ids.sheet_h.text)
+            K = int(ids.kerf.text)
+            strat = ids.strategy.text
+            rot = ids.rot_allowed.active
+            mode = "guillotine" if ids.guillotine.active else "maxrects"
+        except Exception as e:
+            return self.report("STAGE1_INPUT", str(e))
+        if not self._sheets or self._stocks:
+            return self.run_optimizer()
+        from optimizer import GuillotineLayout
+
+        # τα ρετάλια είναι πρώτα και έχουν δικές τους διαστάσεις
+        first = next((sh for sh in self._sheets if sh.offcut is None), None)
+        if first is None:
+            return self.run_optimizer()
+        same = (first.sheet_w, first.sheet_h, first.kerf) == (W, H, K)
+        if not same or isinstance(first, GuillotineLayout) != (mode == "guillotine"):
+            return self.run_optimizer()
+        # τα τεμάχια από δουλειά με υλικά είναι [w, h, q, υλικό]· χωρίς
+        # stocks το υλικό δεν παίζει ρόλο, όπως και στο batch
+        new = [tuple(p[:3]) for p in self.pieces[self._planned:]]
+        if not new:
+            self.set_status("Δεν υπάρχουν νέα τεμάχια.")
+            return
+        # το refine μπορεί να πάρει ώρα σε μεγάλα πλάνα: ίδιο thread/Clock
+        # με το run_optimizer, και η Ακύρωση κόβει το refine
+        self._opt_cancel.clear()
+        self._planning = len(self.pieces)
+        self._set_running(True)
+        self.set_status("Προσθήκη στο πλάνο...")
+        self._opt_thread = threading.Thread(
+            target=self._add_worker,
+            args=(list(self._sheets), new, strat, rot),
+            daemon=True,
+        )
+        self._opt_thread.start()
+
+    def cancel_optimizer(self, *a):
+        if self._opt_thread is not None:
+            self._opt_cancel.set()
+            self.set_status("Ακύρωση...")
+
+    def _set_running(self, running):
+        ids = self.root_widget.ids
+        ids.run_btn.disabled = running
+        ids.cancel_btn.disabled = not running
+
+    def _optimizer_worker(self, W, H, K, pieces, strat, rot, att, mode, stocks):
+        def progress(done, total, best):
+            Clock.schedule_once(lambda dt: self._on_progress(done, total, best))
+
+        from optimizer import optimize_cut_materials, optimize_cut_multi_start
+
+        inventory = self._inventory
+        if inventory is None:
+            inventory, err = self._read_inventory()
+            self._inventory = inventory
+            if err:
+                Clock.schedule_once(lambda dt: self.report("LOAD_OFFCUTS", err, ""))
+        stats = {}
+        try:
+            if stocks:
+                # ένα optimize ανά υλικό και stock, το progress είναι του τρέχοντος
+                by_material = optimize_cut_materials(
+                    K, pieces, stocks, strat, rot, att, stats=stats, mode=mode,
+                    inventory=inventory, progress=progress, stop=self._opt_cancel.is_set,
+                )
+                sheets = [sh for shs in by_material.values() for sh in shs]
+            else:
+                sheets = optimize_cut_multi_start(
+                    W, H, K, [tuple(p[:3]) for p in pieces], strat, rot, att,
+                    progress=progress, stop=self._opt_cancel.is_set, stats=stats,
+                    mode=mode, profile=self.profile, offcuts=inventory.matching(),
+                )
+        except Exception as e:
+            detail, trace = str(e), traceback.format_exc()
+            Clock.schedule_once(lambda dt: self._on_optimizer_error(detail, trace))
+            return
+        self._append_log("[STATS] " + json.dumps(stats))
+        cancelled = self._opt_cancel.is_set()
+        Clock.schedule_once(lambda dt: self._on_optimizer_done(sheets, cancelled))
+
+    def _add_worker(self, sheets, new, strat, rot):
+        from optimizer import optimize_cut_incremental
+
+        stats = {}
         try:
-            sheets = optimize_cut_multi_start(W, H, K, self.pieces, strat, rot, att)
+            sheets = optimize_cut_incremental(sheets, new, strat, rot, refine=True,
+                                              stop=self._opt_cancel.is_set, stats=stats)
         except Exception as e:
-            return self.report("STAGE2_OPT", str(e))
+            detail, trace = str(e), traceback.format_exc()
+            Clock.schedule_once(lambda dt: self._on_optimizer_error(detail, trace,
+                                                                    "STAGE2_ADD"))
+            return
+        self._append_log("[STATS] " + json.dumps(stats))
+        cancelled = self._opt_cancel.is_set()
+        Clock.schedule_once(lambda dt: self._on_optimizer_done(sheets, cancelled))
+
+    def _on_progress(self, done, total, best):
+        if self._opt_cancel.is_set():
+            return
+        n, scrap = best
+        self.set_status(f"Attempt {done}/{total} | Φύλλα:{n} | scrap {scrap}")
+
+    def _on_optimizer_error(self, detail, trace, stage="STAGE2_OPT"):
+        self._opt_thread = None
+        self._set_running(False)
+        self.report(stage, detail, trace)
 
+    def _on_optimizer_done(self, sheets, cancelled):
+        self._opt_thread = None
+        self._set_running(False)
         if not sheets:
-            self.set_status("Άδειο αποτέλεσμα.")
+            self.set_status("Ακυρώθηκε." if cancelled else "Άδειο αποτέλεσμα.")
             return
+        self._sheets = sheets
+        self._planned = self._planning
+        self.show_sheets(sheets, cancelled)
 
+    def show_sheets(self, sheets, cancelled=False):
+        ids = self.root_widget.ids
         cont = ids.sheets_container
         cont.clear_widgets()
         self._panels = []
@@ -166,6 +428,9 @@ class CutApp(App):
                     f"sheet_w={sh.sheet_w}\n"
                     f"sheet_h={sh.sheet_h}\n"
                     f"pieces={len(placed)}\n"
+                    + (f"offcut=#{sh.offcut.id}\n" if sh.offcut is not None else "")
+                    + (f"stock={sh.stock}\n" if sh.stock is not None else "")
+                    + (f"cuts={len(sh.cuts())}\n" if hasattr(sh, "cuts") else "")
                 )
             except Exception as e:
                 panel_fail = True
@@ -173,16 +438,121 @@ class CutApp(App):
                 self._append_log(traceback.format_exc())
 
         overall = (100 * total_used / total_area) if total_area else 0
+        ids.export_all_btn.disabled = ids.share_all_btn.disabled = False
+        self._exported = []
+        self._start_render(sheets, preview=True)
         if panel_fail:
             self.set_status("ERR:SIMPLEPANEL")
         else:
-            self.set_status(f"OK ✔ Φύλλα:{len(sheets)} | Κάλυψη {overall:.1f}%")
+            prefix = "Ακυρώθηκε, καλύτερο ως τώρα:" if cancelled else "OK ✔"
+            cost = sum(sh.stock.cost for sh in sheets if sh.stock is not None)
+            self.set_status(f"{prefix} Φύλλα:{len(sheets)} | Κάλυψη {overall:.1f}%"
+                            + (f" | Κόστος {cost:g}" if cost else ""))
+
+    def _start_render(self, sheets, preview=False, share=False):
+        # preview: μικρές εικόνες στο sheets_container, αλλιώς PNG σε πλήρες
+        # μέγεθος στο export/. Ένα render τη φορά: νέο preview σταματά ό,τι
+        # τρέχει, ενώ export πάνω σε export αγνοείται.
+        if not preview and self._render_thread is not None:
+            self.set_status("Render σε εξέλιξη, δοκίμασε ξανά.")
+            return
+        self._render_gen += 1
+        gen = self._render_gen
+        # κάθε render σε δικό του υποφάκελο: ένα thread που αντικαταστάθηκε
+        # μπορεί να γράφει ακόμα στον δικό του, που σβήνεται στο επόμενο render
+        try:
+            root = os.path.join(self.user_data_dir, "preview" if preview else "export")
+            out_dir = os.path.join(root, str(gen))
+            os.makedirs(out_dir, exist_ok=True)
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                if name == str(gen):
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif name.endswith(".png"):
+                    os.remove(path)
+        except Exception as e:
+            return self.report("RENDER_DIR", str(e))
+        if preview:
+            # νέο όνομα ανά render, αλλιώς το Image δείχνει την cached εικόνα
+            kwargs = dict(max_px=None, prefix=f"p{gen}",
+                          on_preview=lambda i, p: Clock.schedule_once(
+                              lambda dt: self._on_preview(gen, p)))
+        else:
+            n = len(sheets)
+            kwargs = dict(preview_px=None,
+                          on_sheet=lambda i, p: Clock.schedule_once(
+                              lambda dt: self.set_status(f"Export {i + 1}/{n}")))
+        self._render_thread = threading.Thread(
+            target=self._render_worker,
+            args=(gen, list(sheets), out_dir, kwargs, preview, share),
+            daemon=True,
+        )
+        self._render_thread.start()
+
+    def _render_worker(self, gen, sheets, out_dir, kwargs, preview, share):
+        try:
+            from render import export_sheets
+
+            paths = export_sheets(sheets, out_dir, stop=lambda: self._render_gen != gen,
+                                  **kwargs)
+        except Exception as e:
+            detail, trace = str(e), traceback.format_exc()
+            Clock.schedule_once(lambda dt: self._on_render_error(gen, detail, trace))
+            return
+        Clock.schedule_once(lambda dt: self._on_render_done(gen, paths, preview, share))
+
+    def _on_preview(self, gen, path):
+        if gen != self._render_gen:
+            return
+        from kivy.uix.image import Image
+
+        self.root_widget.ids.sheets_container.add_widget(
+            Image(source=path, fit_mode="contain", size_hint_y=None, height=dp(380)))
+
+    def _on_render_error(self, gen, detail, trace):
+        # render που αντικαταστάθηκε: το λάθος του (π.χ. σβήστηκε ο φάκελός
+        # του) δεν αφορά πια
+        if gen != self._render_gen:
+            return
+        self._render_thread = None
+        self.report("RENDER", detail, trace)
+
+    def _on_render_done(self, gen, paths, preview, share):
+        if gen != self._render_gen:
+            return
+        self._render_thread = None
+        if preview:
+            return
+        self._exported = paths
+        if share:
+            self._share(paths)
+        elif paths:
+            self.set_status(f"Export: {len(paths)} PNG στο {os.path.dirname(paths[0])}")
+
+    def _share(self, paths):
+        # "Share Paths": τα paths των PNG στο clipboard και στο debug
+        from kivy.core.clipboard import Clipboard
+
+        text = "\n".join(paths)
+        Clipboard.copy(text)
+        self.set_debug(text)
+        self.set_status(f"Αντιγράφηκαν {len(paths)} paths")
 
     def export_all_png(self, *a):
-        self.set_status("Dummy export για debug")
+        if not self._sheets:
+            self.set_status("Δεν υπάρχει πλάνο.")
+            return
+        self._start_render(self._sheets)
 
     def share_all_png(self, *a):
-        self.set_status("Dummy share για debug")
+        if self._exported:
+            return self._share(self._exported)
+        if not self._sheets:
+            self.set_status("Δεν υπάρχει πλάνο.")
+            return
+        self._start_render(self._sheets, share=True)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,104 @@
 # optimizer.py
+import bisect
+import math
 import random
-from copy import deepcopy
-from typing import List, Tuple, Optional
+import time
+from collections import OrderedDict
+from typing import Callable, Iterator, List, Tuple, Optional
+
+try:
+    import numpy as _np
+except ImportError:  # το Android build έχει μόνο kivy και pillow
+    _np = None
+
+# Από πόσα free rects και πάνω το try_place_piece βαθμολογεί με NumPy.
+# Κάτω από αυτό το σταθερό κόστος των κλήσεων NumPy είναι μεγαλύτερο από
+# το loop πάνω στο _FreeRectIndex (μετρημένο crossover ~250-300 rects).
+NUMPY_MIN_FREE_RECTS = 256
+
+# Όριο του _PackCache ενός optimize σε τεμάχια (άθροισμα του μήκους των
+# cached σειρών). Για δουλειά 2000 τεμαχίων ένα attempt πιάνει ~2MB, άρα
+# το όριο κρατάει τη μνήμη γύρω στα 20MB.
+PACK_CACHE_PIECES = 20000
+
+# Μέχρι πόσα τεμάχια τρέχει το exact branch-and-bound μετά τα attempts,
+# και με πόσο χρόνο (δευτερόλεπτα).
+EXACT_MAX_PIECES = 20
+EXACT_TIME = 2.0
+
+# Ελάχιστη πλευρά (mm) για να κρατηθεί ένα περίσσευμα ως ρετάλι.
+OFFCUT_MIN_SIDE = 150
+
+
+class _Profile:
+    # Μετρητές του optimize(..., profile=True). Τα hooks στα hot paths
+    # κοιτάνε μόνο αν _PROFILE is not None και κάνουν όλη τη μέτρηση μέσα
+    # στο if, οπότε χωρίς profile το κόστος είναι ένα global lookup ανά κλήση.
+    # Ένα profiled optimize τη φορά (το _PROFILE είναι κοινό στα threads).
+    COUNTERS = ("place_calls", "place_runs", "candidates", "free_rects_sum",
+                "free_rects_max", "merge_calls", "merge_rounds", "merges",
+                "compactor_moves", "compactor_emptied", "refine_groups",
+                "refine_accepted")
+
+    def __init__(self):
+        for c in self.COUNTERS:
+            setattr(self, c, 0)
+        # ανά attempt: {"attempt", "pack", "compact", "refine", "reused", "sheets"}
+        self.attempts = []
+        self.exact_time = 0.0
+
+    def on_place(self, sheet, piece: "Piece"):
+        self.place_calls += 1
+        n = sheet._free_count()
+        self.free_rects_sum += n
+        if n > self.free_rects_max:
+            self.free_rects_max = n
+        self.candidates += sheet._count_candidates(piece)
+
+    def as_dict(self) -> dict:
+        d = {c: getattr(self, c) for c in self.COUNTERS}
+        d["attempts"] = self.attempts
+        d["exact_time"] = self.exact_time
+        return d
+
+    @staticmethod
+    def merge(a: dict, b: dict) -> dict:
+        # για τα αποτελέσματα των workers του process pool
+        out = dict(a)
+        for k, v in b.items():
+            if k == "attempts":
+                out[k] = sorted(a.get(k, []) + v, key=lambda r: r["attempt"])
+            elif k == "free_rects_max":
+                out[k] = max(a.get(k, 0), v)
+            else:
+                out[k] = a.get(k, 0) + v
+        return out
+
+
+_PROFILE: Optional[_Profile] = None
+
+
+class _profiling:
+    # with _profiling(prof): ενεργό _PROFILE μέσα στο block (prof None = τίποτα)
+    def __init__(self, prof: Optional[_Profile]):
+        self.prof = prof
+
+    def __enter__(self):
+        global _PROFILE
+        self.prev = _PROFILE
+        if self.prof is not None:
+            _PROFILE = self.prof
+        return self.prof
+
+    def __exit__(self, *exc):
+        global _PROFILE
+        _PROFILE = self.prev
+        return False
 
 
 class Piece:
+    __slots__ = ("w", "h", "name")
+
     def __init__(self, w: int, h: int, name: Optional[str] = None):
         self.w = w
         self.h = h
@@ -15,25 +109,148 @@ class Piece:
 
 
 class PlacedPiece:
+    # w, h: διαστάσεις πάνω στο φύλλο, μετά την περιστροφή
+    __slots__ = ("piece", "x", "y", "rotated", "w", "h")
+
     def __init__(self, piece: Piece, x: int, y: int, rotated: bool):
         self.piece = piece
         self.x = x
         self.y = y
         self.rotated = rotated
+        self.w = piece.h if rotated else piece.w
+        self.h = piece.w if rotated else piece.h
 
     def width(self):
-        return self.piece.h if self.rotated else self.piece.w
+        return self.w
 
     def height(self):
-        return self.piece.w if self.rotated else self.piece.h
+        return self.h
 
 
 class FreeRect:
+    __slots__ = ("x", "y", "w", "h", "order")
+
     def __init__(self, x: int, y: int, w: int, h: int):
         self.x = x
         self.y = y
         self.w = w
         self.h = h
+        # κλειδί σειράς μέσα στο φύλλο, το βάζει το _FreeRectIndex
+        self.order: Tuple[int, ...] = ()
+
+
+class _FreeRectIndex:
+    # Ευρετήριο πάνω στα free_rects ενός φύλλου.
+    # by_size: κάδοι ανά (w.bit_length(), h.bit_length()) για τα "χωράει w x h"
+    # cells:   χοντρό grid GRID x GRID πάνω στο φύλλο για τα "τέμνει το used"
+    #          και για τους γείτονες που μπορεί να ενωθούν
+    #
+    # Το fr.order κρατά τη σειρά που θα είχαν τα rects σε μια απλή λίστα
+    # (ένα append παίρνει νέο (n,), ένα κομμάτι του prune παίρνει order
+    # γονέα + (j,), ένα merge κρατά το order του πρώτου), ώστε η ισοβαθμία
+    # στο try_place_piece και η σειρά των merge να μένουν ίδιες.
+    GRID = 4
+    MAX_ORDER_DEPTH = 8
+
+    def __init__(self, sheet_w: int, sheet_h: int):
+        self.cw = max(1, -(-sheet_w // self.GRID))
+        self.ch = max(1, -(-sheet_h // self.GRID))
+        self.rects = set()
+        self.by_size = {}
+        self.cells = {}
+        self.counter = 0
+        self._ordered = None
+        self._arrays = None
+
+    def _cells_of(self, x: int, y: int, w: int, h: int):
+        cw, ch = self.cw, self.ch
+        x0, x1 = x // cw, (x + w - 1) // cw
+        for cy in range(y // ch, (y + h - 1) // ch + 1):
+            for cx in range(x0, x1 + 1):
+                yield (cx, cy)
+
+    def rebuild(self, rects: List[FreeRect]):
+        self.rects = set()
+        self.by_size = {}
+        self.cells = {}
+        for i, fr in enumerate(rects):
+            self.add(fr, (i,))
+        self.counter = len(rects)
+
+    def ordered(self) -> List[FreeRect]:
+        if self._ordered is None:
+            self._ordered = sorted(self.rects, key=lambda r: r.order)
+        return self._ordered
+
+    def arrays(self):
+        # x, y, w, h σε πίνακες NumPy, με τη σειρά του ordered()
+        if self._arrays is None:
+            rects = self.ordered()
+            xywh = _np.array([(r.x, r.y, r.w, r.h) for r in rects],
+                             dtype=_np.int64).reshape(-1, 4)
+            self._arrays = (rects, xywh[:, 0], xywh[:, 1], xywh[:, 2], xywh[:, 3])
+        return self._arrays
+
+    def next_order(self) -> Tuple[int, ...]:
+        self.counter += 1
+        return (self.counter,)
+
+    def add(self, fr: FreeRect, order: Tuple[int, ...]):
+        fr.order = order
+        self._ordered = None
+        self._arrays = None
+        self.rects.add(fr)
+        self.by_size.setdefault((fr.w.bit_length(), fr.h.bit_length()), []).append(fr)
+        for c in self._cells_of(fr.x, fr.y, fr.w, fr.h):
+            self.cells.setdefault(c, []).append(fr)
+
+    def remove(self, fr: FreeRect):
+        self._ordered = None
+        self._arrays = None
+        self.rects.remove(fr)
+        key = (fr.w.bit_length(), fr.h.bit_length())
+        bucket = self.by_size[key]
+        bucket.remove(fr)
+        if not bucket:
+            del self.by_size[key]
+        for c in self._cells_of(fr.x, fr.y, fr.w, fr.h):
+            self.cells[c].remove(fr)
+
+    def fitting(self, w: int, h: int):
+        bw, bh = w.bit_length(), h.bit_length()
+        for (kw, kh), bucket in self.by_size.items():
+            if kw < bw or kh < bh:
+                continue
+            for fr in bucket:
+                if w <= fr.w and h <= fr.h:
+                    yield fr
+
+    def near(self, x: int, y: int, w: int, h: int) -> set:
+        out = set()
+        cells = self.cells
+        for c in self._cells_of(x, y, w, h):
+            cell = cells.get(c)
+            if cell:
+                out.update(cell)
+        return out
+
+    def overlapping(self, r: FreeRect) -> List[FreeRect]:
+        return [fr for fr in self.near(r.x, r.y, r.w, r.h)
+                if SheetLayout._intersects(fr, r)]
+
+
+def _score_bssf(leftover_w: int, leftover_h: int):
+    short_side = min(leftover_h, leftover_w)
+    return (short_side, leftover_h * leftover_w)
+
+def _score_baf(leftover_w: int, leftover_h: int):
+    return (leftover_h * leftover_w, min(leftover_h, leftover_w))
+
+def _score_blsf(leftover_w: int, leftover_h: int):
+    return (max(leftover_h, leftover_w), min(leftover_h, leftover_w))
+
+# άγνωστη στρατηγική -> BSSF
+_SCORE_FNS = {"BSSF": _score_bssf, "BAF": _score_baf, "BLSF": _score_blsf}
 
 
 class SheetLayout:
@@ -44,15 +261,81 @@ class SheetLayout:
         self.kerf = kerf
         self.strategy = strategy
         self.allow_rotation = allow_rotation
+        # Offcut αν το φύλλο είναι ρετάλι της αποθήκης, Stock αν βγήκε από
+        # optimize_cut_materials, αλλιώς None
+        self.offcut = None
+        self.stock = None
+
+        self._index = _FreeRectIndex(sheet_w, sheet_h)
+        self.placed = []
+        self.free_rects = [FreeRect(0, 0, sheet_w, sheet_h)]
+
+    @property
+    def placed(self) -> List[PlacedPiece]:
+        return self._placed
+
+    @placed.setter
+    def placed(self, pieces: List[PlacedPiece]):
+        self._placed = pieces
+        # (x, πλάτος) -> χαμηλότερο κάτω άκρο τεμαχίου σε αυτή τη στήλη
+        self._col_bottom = {}
+        for p in pieces:
+            self._add_to_column(p.x, p.w, p.y + p.h)
+
+    def _add_to_column(self, x: int, w: int, bottom: int):
+        key = (x, w)
+        cur = self._col_bottom.get(key)
+        if cur is None or bottom < cur:
+            self._col_bottom[key] = bottom
+
+    @property
+    def free_rects(self) -> List[FreeRect]:
+        return list(self._index.ordered())
 
-        self.placed: List[PlacedPiece] = []
-        self.free_rects: List[FreeRect] = [FreeRect(0, 0, sheet_w, sheet_h)]
+    @free_rects.setter
+    def free_rects(self, rects: List[FreeRect]):
+        self._index.rebuild(rects)
+        # άγνωστη προέλευση: όλα ελέγχονται στο επόμενο _merge_free_rects
+        self._dirty = set(rects)
+
+    def copy(self) -> "SheetLayout":
+        # φθηνό snapshot: τα Piece/PlacedPiece μοιράζονται (δεν αλλάζουν),
+        # τα FreeRect αντιγράφονται γιατί το ευρετήριο τους αλλάζει το order
+        sh = SheetLayout.__new__(SheetLayout)
+        sh.sheet_w = self.sheet_w
+        sh.sheet_h = self.sheet_h
+        sh.kerf = self.kerf
+        sh.strategy = self.strategy
+        sh.allow_rotation = self.allow_rotation
+        sh.offcut = self.offcut
+        sh.stock = self.stock
+        sh._placed = list(self._placed)
+        sh._col_bottom = dict(self._col_bottom)
+        src = self._index
+        index = _FreeRectIndex(self.sheet_w, self.sheet_h)
+        clones = {}
+        for fr in src.rects:
+            nf = FreeRect(fr.x, fr.y, fr.w, fr.h)
+            index.add(nf, fr.order)
+            clones[fr] = nf
+        index.counter = src.counter
+        sh._index = index
+        sh._dirty = {clones[r] for r in self._dirty if r in clones}
+        return sh
+
+    def _swap_placed(self, placed: List[PlacedPiece]):
+        # ίδιες θέσεις με άλλα PlacedPiece (βλ. _PackCache)
+        self._placed = placed
+
+    def _adopt(self, other: "SheetLayout"):
+        self.placed = other.placed
+        self.free_rects = other.free_rects
 
     def get_all_placed(self) -> List[PlacedPiece]:
         return list(self.placed)
 
     def get_used_area(self) -> int:
-        return sum(p.width() * p.height() for p in self.placed)
+        return sum(p.w * p.h for p in self._placed)
 
     @staticmethod
     def _intersects(a: FreeRect, b: FreeRect) -> bool:
@@ -72,83 +355,196 @@ class SheetLayout:
             b.y + b.h <= a.y + a.h
         )
 
+    def _free_count(self) -> int:
+        return len(self._index.rects)
+
+    def _count_candidates(self, piece: Piece) -> int:
+        # (free rect, προσανατολισμός) που εξετάζει το _choose, μόνο για το profile
+        n = sum(1 for _ in self._index.fitting(piece.w, piece.h))
+        if self.allow_rotation:
+            n += sum(1 for _ in self._index.fitting(piece.h, piece.w))
+        return n
+
     def try_place_piece(self, piece: Piece) -> bool:
+        if _PROFILE is not None:
+            _PROFILE.on_place(self, piece)
+        if _np is not None and len(self._index.rects) >= NUMPY_MIN_FREE_RECTS:
+            choice = self._choose_numpy(piece)
+        else:
+            choice = self._choose(piece)
+        if choice is None:
+            return False
+        fr, rot, pw, ph = choice
+        self._place_and_split(fr, piece, rot, fr.x, fr.y, pw, ph)
+        return True
+
+    def place_run(self, pieces: List[Piece]) -> int:
+        # Τεμάχια ίδιων διαστάσεων: ένα query για το πρώτο διαλέγει free rect
+        # και προσανατολισμό, και μέσα σε αυτό μπαίνει ολόκληρο μπλοκ από
+        # γεμάτες σειρές x στήλες (με kerf ανάμεσα) με ένα μόνο split.
+        # Επιστρέφει πόσα μπήκαν (0 αν δεν χωράει ούτε το πρώτο).
+        if len(pieces) == 1:
+            return 1 if self.try_place_piece(pieces[0]) else 0
+        first = pieces[0]
+        if _PROFILE is not None:
+            _PROFILE.place_runs += 1
+            _PROFILE.on_place(self, first)
+        if _np is not None and len(self._index.rects) >= NUMPY_MIN_FREE_RECTS:
+            choice = self._choose_numpy(first)
+        else:
+            choice = self._choose(first)
+        if choice is None:
+            return 0
+        fr, rot, pw, ph = choice
+        k = self.kerf
+        n = len(pieces)
+        cols = min(n, (fr.w + k) // (pw + k))
+        rows = min(n // cols, (fr.h + k) // (ph + k))
+        x0, y0 = fr.x, fr.y
+        i = 0
+        for r in range(rows):
+            y = y0 + r * (ph + k)
+            for c in range(cols):
+                x = x0 + c * (pw + k)
+                self._placed.append(PlacedPiece(pieces[i], x, y, rot))
+                self._add_to_column(x, pw, y + ph)
+                i += 1
+        self._split_free(fr, x0, y0, cols * pw + (cols - 1) * k, rows * ph + (rows - 1) * k)
+        return i
+
+    def _choose(self, piece: Piece):
         orientations = [False, True] if self.allow_rotation else [False]
+        index = self._index
 
         # 1) exact-fit pass
         exact_best = None
-        for i, fr in enumerate(self.free_rects):
-            for rot in orientations:
-                pw = piece.h if rot else piece.w
-                ph = piece.w if rot else piece.h
-                if pw <= fr.w and ph <= fr.h:
-                    if pw == fr.w or ph == fr.h:
-                        cand = (fr.y, fr.x, i, rot, fr.x, fr.y, pw, ph)
-                        if exact_best is None or cand < exact_best:
-                            exact_best = cand
+        for rot in orientations:
+            pw = piece.h if rot else piece.w
+            ph = piece.w if rot else piece.h
+            for fr in index.fitting(pw, ph):
+                if pw == fr.w or ph == fr.h:
+                    cand = (fr.y, fr.x, fr.order, rot, fr, pw, ph)
+                    if exact_best is None or cand < exact_best:
+                        exact_best = cand
         if exact_best is not None:
-            _, _, fr_i, rot, x, y, pw, ph = exact_best
-            self._place_and_split(fr_i, piece, rot, x, y, pw, ph)
-            return True
+            _, _, _, rot, fr, pw, ph = exact_best
+            return fr, rot, pw, ph
 
         # 2) scored pass
-        def base_score(fr_w, fr_h, pw, ph):
-            leftover_h = fr_h - ph
-            leftover_w = fr_w - pw
-            short_side = min(leftover_h, leftover_w)
-            long_side  = max(leftover_h, leftover_w)
-            area_left  = leftover_h * leftover_w
-            st = self.strategy
-            if st == "BSSF":
-                return (short_side, area_left)
-            elif st == "BAF":
-                return (area_left, short_side)
-            elif st == "BLSF":
-                return (long_side, short_side)
-            else:
-                return (short_side, area_left)
-
-        def strip_bias(fr: FreeRect, pw: int, ph: int) -> int:
-            penalty = 10_000
-            if fr.x == 0:
-                penalty -= 200
-            col_hits = [
-                p for p in self.placed
-                if p.x == fr.x and p.width() == pw and (p.y + p.height()) <= fr.y + 1
-            ]
-            if col_hits:
-                penalty -= 5000
-            penalty -= min(fr.y, 200)
-            return penalty
-
+        score_fn = _SCORE_FNS.get(self.strategy, _score_bssf)
         best = None
-        for i, fr in enumerate(self.free_rects):
-            for rot in orientations:
-                pw = piece.h if rot else piece.w
-                ph = piece.w if rot else piece.h
-                if pw <= fr.w and ph <= fr.h:
-                    primary = base_score(fr.w, fr.h, pw, ph)
-                    sb = strip_bias(fr, pw, ph)
-                    cand = (
-                        primary[0], primary[1],
-                        fr.y, fr.x,
-                        sb,
-                        i, rot, fr.x, fr.y, pw, ph
-                    )
-                    if best is None or cand < best:
-                        best = cand
+        for rot in orientations:
+            pw = piece.h if rot else piece.w
+            ph = piece.w if rot else piece.h
+            for fr in index.fitting(pw, ph):
+                primary = score_fn(fr.w - pw, fr.h - ph)
+                sb = self._strip_bias(fr, pw)
+                cand = (
+                    primary[0], primary[1],
+                    fr.y, fr.x,
+                    sb,
+                    fr.order, rot, fr, pw, ph
+                )
+                if best is None or cand < best:
+                    best = cand
 
         if best is None:
-            return False
+            return None
+        _, _, _, _, _, _, rot, fr, pw, ph = best
+        return fr, rot, pw, ph
 
-        _, _, _, _, _, fr_i, rot, x, y, pw, ph = best
-        self._place_and_split(fr_i, piece, rot, x, y, pw, ph)
-        return True
+    def _choose_numpy(self, piece: Piece):
+        # Ίδια επιλογή με το _choose, διανυσματικά πάνω στα x/y/w/h όλων των
+        # free rects. Η θέση στους πίνακες είναι η σειρά order, και ο
+        # προσανατολισμός κωδικοποιείται ως j = pos + rot * n.
+        np = _np
+        rects, xs, ys, ws, hs = self._index.arrays()
+        n = len(rects)
+        dims = [(piece.w, piece.h)]
+        if self.allow_rotation:
+            dims.append((piece.h, piece.w))
+        fits = [np.flatnonzero((ws >= pw) & (hs >= ph)) for pw, ph in dims]
+
+        # 1) exact-fit pass: min (y, x, order, rot)
+        exact = np.concatenate([
+            f[(ws[f] == pw) | (hs[f] == ph)] + r * n
+            for r, ((pw, ph), f) in enumerate(zip(dims, fits))
+        ])
+        if exact.size:
+            pos = exact % n
+            j = int(exact[np.lexsort((exact >= n, pos, xs[pos], ys[pos]))[0]])
+            pw, ph = dims[j // n]
+            return rects[j % n], j >= n, pw, ph
 
-    def _place_and_split(self, fr_i: int, piece: Piece, rotated: bool,
+        # 2) scored pass: min (s0, s1, y, x) διανυσματικά, και strip bias /
+        #    order / rot μόνο για όσα ισοβαθμούν σε αυτά
+        j_all = np.concatenate([f + r * n for r, f in enumerate(fits)])
+        if not j_all.size:
+            return None
+        pos = j_all % n
+        rot = j_all >= n
+        lw = ws[pos] - np.where(rot, piece.h, piece.w)
+        lh = hs[pos] - np.where(rot, piece.w, piece.h)
+        short = np.minimum(lw, lh)
+        st = self.strategy
+        if st == "BAF":
+            s0, s1 = lw * lh, short
+        elif st == "BLSF":
+            s0, s1 = np.maximum(lw, lh), short
+        else:
+            s0, s1 = short, lw * lh
+        yy = ys[pos]
+        xx = xs[pos]
+        m = np.lexsort((xx, yy, s1, s0))[0]
+        tied = j_all[(s0 == s0[m]) & (s1 == s1[m]) & (yy == yy[m]) & (xx == xx[m])]
+        best = None
+        for j in tied.tolist():
+            fr = rects[j % n]
+            pw, ph = dims[j // n]
+            cand = (self._strip_bias(fr, pw), j % n, j >= n, j, fr, pw, ph)
+            if best is None or cand[:3] < best[:3]:
+                best = cand
+        _, _, _, j, fr, pw, ph = best
+        return fr, j >= n, pw, ph
+
+    def remove_placed(self, pp: PlacedPiece):
+        # Βγάζει το τεμάχιο και δίνει πίσω το ορθογώνιό του ως ελεύθερο
+        # χώρο, χωρίς να ξαναστήσει το φύλλο. Το κενό του kerf γύρω του
+        # μένει εκτός, άρα ο χώρος που επιστρέφει είναι πάντα πραγματικά ελεύθερος.
+        self._placed.remove(pp)
+        key = (pp.x, pp.w)
+        bottoms = [p.y + p.h for p in self._placed if p.x == pp.x and p.w == pp.w]
+        if bottoms:
+            self._col_bottom[key] = min(bottoms)
+        else:
+            self._col_bottom.pop(key, None)
+        fr = FreeRect(pp.x, pp.y, pp.w, pp.h)
+        self._index.add(fr, self._index.next_order())
+        self._merge_free_rects([fr])
+
+    def _strip_bias(self, fr: FreeRect, pw: int) -> int:
+        penalty = 10_000
+        if fr.x == 0:
+            penalty -= 200
+        # υπάρχει ήδη τεμάχιο ίδιου πλάτους στην ίδια στήλη, πάνω από το fr
+        bottom = self._col_bottom.get((fr.x, pw))
+        if bottom is not None and bottom <= fr.y + 1:
+            penalty -= 5000
+        penalty -= min(fr.y, 200)
+        return penalty
+
+    def _place_and_split(self, fr: FreeRect, piece: Piece, rotated: bool,
                          x: int, y: int, pw: int, ph: int):
-        self.placed.append(PlacedPiece(piece, x, y, rotated))
-        fr = self.free_rects.pop(fr_i)
+        self._placed.append(PlacedPiece(piece, x, y, rotated))
+        self._add_to_column(x, pw, y + ph)
+        self._split_free(fr, x, y, pw, ph)
+
+    def _split_free(self, fr: FreeRect, x: int, y: int, pw: int, ph: int):
+        # το (x, y, pw, ph) μέσα στο fr γίνεται used: split του fr,
+        # prune όσων το τέμνουν και συντήρηση των free rects
+        index = self._index
+        index.remove(fr)
+        fresh = []
 
         kx = self.kerf if (x + pw) < (fr.x + fr.w) else 0
         ky = self.kerf if (y + ph) < (fr.y + fr.h) else 0
@@ -156,28 +552,50 @@ class SheetLayout:
         rx = x + pw + kx
         rw = (fr.x + fr.w) - rx
         if rw > 0:
-            self.free_rects.append(FreeRect(rx, fr.y, rw, fr.h))
+            r = FreeRect(rx, fr.y, rw, fr.h)
+            index.add(r, index.next_order())
+            fresh.append(r)
 
         by = y + ph + ky
         bh = (fr.y + fr.h) - by
         if bh > 0:
-            self.free_rects.append(FreeRect(fr.x, by, fr.w, bh))
+            r = FreeRect(fr.x, by, fr.w, bh)
+            index.add(r, index.next_order())
+            fresh.append(r)
 
-        self._prune_free_rects_with(FreeRect(x, y, pw, ph))
-        self._merge_free_rects()
+        fresh.extend(self._prune_free_rects_with(FreeRect(x, y, pw, ph)))
+        self._merge_free_rects(fresh)
 
-    def _prune_free_rects_with(self, used: FreeRect):
+    def leftovers(self, min_side: int = OFFCUT_MIN_SIDE) -> List[FreeRect]:
+        # Περισσεύματα που δεν επικαλύπτονται, για ρετάλια: greedy το
+        # μεγαλύτερο free rect, που μετά γίνεται used μαζί με το kerf γύρω
+        # του σε ένα copy, ώστε τα επόμενα να μην το τέμνουν.
+        work = self.copy()
         out = []
-        for fr in self.free_rects:
-            if not self._intersects(fr, used):
-                out.append(fr)
-                continue
+        while True:
+            cands = [f for f in work._index.rects if f.w >= min_side and f.h >= min_side]
+            if not cands:
+                return out
+            fr = max(cands, key=lambda f: (f.w * f.h, -f.y, -f.x))
+            out.append(FreeRect(fr.x, fr.y, fr.w, fr.h))
+            k = self.kerf
+            x0, y0 = max(fr.x - k, 0), max(fr.y - k, 0)
+            used = FreeRect(x0, y0, min(fr.x + fr.w + k, self.sheet_w) - x0,
+                            min(fr.y + fr.h + k, self.sheet_h) - y0)
+            work._merge_free_rects(work._prune_free_rects_with(used))
+
+    def _prune_free_rects_with(self, used: FreeRect) -> List[FreeRect]:
+        index = self._index
+        fresh = []
+        for fr in index.overlapping(used):
+            index.remove(fr)
+            parts = []
 
             if used.y > fr.y:
-                out.append(FreeRect(fr.x, fr.y, fr.w, used.y - fr.y))
+                parts.append(FreeRect(fr.x, fr.y, fr.w, used.y - fr.y))
 
             if used.y + used.h < fr.y + fr.h:
-                out.append(
+                parts.append(
                     FreeRect(fr.x, used.y + used.h, fr.w,
                              (fr.y + fr.h) - (used.y + used.h))
                 )
@@ -185,221 +603,2011 @@ class SheetLayout:
             if used.x > fr.x:
                 top = max(fr.y, used.y)
                 bottom = min(fr.y + fr.h, used.y + used.h)
-                out.append(FreeRect(fr.x, top, used.x - fr.x, bottom - top))
+                parts.append(FreeRect(fr.x, top, used.x - fr.x, bottom - top))
 
             if used.x + used.w < fr.x + fr.w:
                 right_x = used.x + used.w
                 top = max(fr.y, used.y)
                 bottom = min(fr.y + fr.h, used.y + used.h)
-                out.append(
+                parts.append(
                     FreeRect(right_x, top, (fr.x + fr.w) - right_x, bottom - top)
                 )
 
-        self.free_rects = [r for r in out if r.w > 0 and r.h > 0]
+            j = 0
+            for r in parts:
+                if r.w > 0 and r.h > 0:
+                    index.add(r, fr.order + (j,))
+                    fresh.append(r)
+                    j += 1
+        return fresh
 
-    def _merge_free_rects(self):
-        cleaned = []
-        for i, a in enumerate(self.free_rects):
-            if any(i != j and self._contains(b, a) for j, b in enumerate(self.free_rects)):
-                continue
-            cleaned.append(a)
-        self.free_rects = cleaned
-
-        merged = True
-        while merged:
-            merged = False
-            out = []
-            used = [False] * len(self.free_rects)
-            for i, a in enumerate(self.free_rects):
-                if used[i]:
+    @staticmethod
+    def _merge_pair(a: FreeRect, b: FreeRect) -> Optional[FreeRect]:
+        if a.y == b.y and a.h == b.h and (a.x + a.w == b.x or b.x + b.w == a.x):
+            return FreeRect(min(a.x, b.x), a.y, a.w + b.w, a.h)
+        if a.x == b.x and a.w == b.w and (a.y + a.h == b.y or b.y + b.h == a.y):
+            return FreeRect(a.x, min(a.y, b.y), a.w, a.h + b.h)
+        return None
+
+    def _merge_free_rects(self, fresh: List[FreeRect]):
+        # Αυξητική συντήρηση: πριν από το split δεν υπάρχει ζεύγος όπου το ένα
+        # περιέχει το άλλο (εκτός από ό,τι έφτιαξαν τα merge της προηγούμενης
+        # φοράς, το self._dirty) ούτε ζεύγος που ενώνεται. Άρα αρκεί να
+        # ελεγχθούν τα νέα rects απέναντι στα γειτονικά τους.
+        index = self._index
+        order_key = lambda r: r.order
+        deep = any(len(r.order) > index.MAX_ORDER_DEPTH for r in fresh)
+
+        # 1) όποιο rect περιέχεται σε άλλο φεύγει (και τα δύο αν είναι ίδια)
+        doomed = set()
+        for a in [r for r in self._dirty if r in index.rects] + fresh:
+            for b in index.overlapping(a):
+                if b is a:
                     continue
-                did = False
-                for j in range(i + 1, len(self.free_rects)):
-                    if used[j]:
-                        continue
-                    b = self.free_rects[j]
-                    if a.y == b.y and a.h == b.h and (a.x + a.w == b.x or b.x + b.w == a.x):
-                        out.append(FreeRect(min(a.x, b.x), a.y, a.w + b.w, a.h))
-                        used[i] = used[j] = True
-                        merged = True
-                        did = True
-                        break
-                    if a.x == b.x and a.w == b.w and (a.y + a.h == b.y or b.y + b.h == a.y):
-                        out.append(FreeRect(a.x, min(a.y, b.y), a.w, a.h + b.h))
-                        used[i] = used[j] = True
-                        merged = True
-                        did = True
+                if self._contains(b, a):
+                    doomed.add(a)
+                if self._contains(a, b):
+                    doomed.add(b)
+        for r in doomed:
+            index.remove(r)
+        fresh = [r for r in fresh if r not in doomed]
+
+        # 2) γύροι merge: κάθε rect, με τη σειρά order, ενώνεται με τον
+        #    πρώτο ελεύθερο γείτονα που έρχεται μετά από αυτό
+        products = []
+        rounds = 0
+        while fresh:
+            rounds += 1
+            partners = {}
+            for a in fresh:
+                for b in index.near(a.x - 1, a.y - 1, a.w + 2, a.h + 2):
+                    if b is not a and self._merge_pair(a, b) is not None:
+                        partners.setdefault(a, set()).add(b)
+                        partners.setdefault(b, set()).add(a)
+            used = set()
+            pairs = []
+            for a in sorted(partners, key=order_key):
+                if a in used:
+                    continue
+                for b in sorted(partners[a], key=order_key):
+                    if b.order > a.order and b not in used:
+                        pairs.append((a, b))
+                        used.add(a)
+                        used.add(b)
                         break
-                if not did and not used[i]:
-                    out.append(a)
-                    used[i] = True
-            self.free_rects = out
+            fresh = []
+            for a, b in pairs:
+                m = self._merge_pair(a, b)
+                index.remove(a)
+                index.remove(b)
+                index.add(m, a.order)
+                fresh.append(m)
+            products.extend(fresh)
+
+        if _PROFILE is not None:
+            _PROFILE.merge_calls += 1
+            _PROFILE.merge_rounds += rounds
+            _PROFILE.merges += len(products)
+        self._dirty = {m for m in products if m in index.rects}
+        if deep:
+            index.rebuild(index.ordered())
+
+
+# --- guillotine ----------------------------------------------------------
+# Δεύτερη μηχανή για πριόνια πάνελ: κάθε φύλλο είναι δέντρο από κοψίματα
+# που πάνε από άκρη σε άκρη του κομματιού που κόβουν. Κάθε κόψιμο τρώει
+# kerf, οπότε όλα τα τεμάχια βγαίνουν με ευθείες διαδοχικές κοπές.
+
+class Cut:
+    # vertical: κοπή στο x = pos από y = start για length,
+    # αλλιώς οριζόντια στο y = pos από x = start
+    __slots__ = ("vertical", "pos", "start", "length")
+
+    def __init__(self, vertical: bool, pos: int, start: int, length: int):
+        self.vertical = vertical
+        self.pos = pos
+        self.start = start
+        self.length = length
+
+    def __repr__(self):
+        return f"{'V' if self.vertical else 'H'}@{self.pos}[{self.start}+{self.length}]"
 
 
-def _flatten_piece_list(piece_list: List[Tuple[int,int,int]]) -> List[Piece]:
+class _GNode:
+    # Κόμβος του δέντρου. Φύλλο όταν a is None: ελεύθερο ή με τεμάχιο
+    # (placed). Εσωτερικός: κοπή vertical/οριζόντια στο τέλος του a, και το
+    # b ξεκινά μετά το kerf (None αν ό,τι περισσεύει το τρώει το kerf).
+    __slots__ = ("x", "y", "w", "h", "parent", "vertical", "a", "b", "placed")
+
+    def __init__(self, x: int, y: int, w: int, h: int, parent=None):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.parent = parent
+        self.vertical = False
+        self.a = None
+        self.b = None
+        self.placed: Optional[PlacedPiece] = None
+
+
+class GuillotineLayout:
+    # Ίδιο interface με το SheetLayout (try_place_piece, place_run,
+    # remove_placed, copy, placed, free_rects), ώστε first-fit, compactor,
+    # refine και cache να δουλεύουν και με τις δύο μηχανές. Τα ελεύθερα
+    # είναι μόνο τα ελεύθερα φύλλα του δέντρου, που δεν επικαλύπτονται,
+    # άρα πολύ λιγότερα από τα free rects του maxrects.
+    def __init__(self, sheet_w: int, sheet_h: int, kerf: int = 0,
+                 strategy: str = "BSSF", allow_rotation: bool = True):
+        self.sheet_w = sheet_w
+        self.sheet_h = sheet_h
+        self.kerf = kerf
+        self.strategy = strategy
+        self.allow_rotation = allow_rotation
+        self.offcut = None
+        self.stock = None
+        self._root = _GNode(0, 0, sheet_w, sheet_h)
+        self._free: List[_GNode] = [self._root]
+        self._placed: List[PlacedPiece] = []
+        self._leaf = {}
+
+    @property
+    def placed(self) -> List[PlacedPiece]:
+        return self._placed
+
+    @property
+    def free_rects(self) -> List[FreeRect]:
+        return [FreeRect(n.x, n.y, n.w, n.h) for n in self._free]
+
+    def get_all_placed(self) -> List[PlacedPiece]:
+        return list(self._placed)
+
+    def get_used_area(self) -> int:
+        return sum(p.w * p.h for p in self._placed)
+
+    def _nodes(self) -> Iterator[_GNode]:
+        # preorder χωρίς αναδρομή (το δέντρο μπορεί να έχει βάθος εκατοντάδων)
+        stack = [self._root]
+        while stack:
+            n = stack.pop()
+            yield n
+            if n.a is not None:
+                if n.b is not None:
+                    stack.append(n.b)
+                stack.append(n.a)
+
+    def cuts(self) -> List[Cut]:
+        # Η σειρά κοπής: κάθε κομμάτι κόβεται πριν από τα κομμάτια που βγαίνουν
+        # από αυτό, ξεκινώντας από ολόκληρο το φύλλο.
+        out = []
+        for n in self._nodes():
+            if n.a is None:
+                continue
+            if n.vertical:
+                out.append(Cut(True, n.a.x + n.a.w, n.y, n.h))
+            else:
+                out.append(Cut(False, n.a.y + n.a.h, n.x, n.w))
+        return out
+
+    def copy(self) -> "GuillotineLayout":
+        sh = GuillotineLayout.__new__(GuillotineLayout)
+        sh.sheet_w = self.sheet_w
+        sh.sheet_h = self.sheet_h
+        sh.kerf = self.kerf
+        sh.strategy = self.strategy
+        sh.allow_rotation = self.allow_rotation
+        sh.offcut = self.offcut
+        sh.stock = self.stock
+        sh._placed = list(self._placed)
+        clones = {}
+        sh._leaf = {}
+        for n in self._nodes():
+            c = _GNode(n.x, n.y, n.w, n.h, clones.get(n.parent))
+            c.vertical = n.vertical
+            c.placed = n.placed
+            clones[n] = c
+            if n.parent is not None:
+                if n.parent.a is n:
+                    c.parent.a = c
+                else:
+                    c.parent.b = c
+            if n.placed is not None:
+                sh._leaf[n.placed] = c
+        sh._root = clones[self._root]
+        sh._free = [clones[n] for n in self._free]
+        return sh
+
+    def _swap_placed(self, placed: List[PlacedPiece]):
+        # ίδιες θέσεις με άλλα PlacedPiece, στη σειρά του self.placed
+        for old, new in zip(self._placed, placed):
+            leaf = self._leaf.pop(old)
+            leaf.placed = new
+            self._leaf[new] = leaf
+        self._placed = placed
+
+    def _adopt(self, other: "GuillotineLayout"):
+        self._root = other._root
+        self._free = other._free
+        self._placed = other._placed
+        self._leaf = other._leaf
+
+    def _choose(self, piece: Piece):
+        orientations = [False, True] if self.allow_rotation else [False]
+        score_fn = _SCORE_FNS.get(self.strategy, _score_bssf)
+        best = None
+        for i, n in enumerate(self._free):
+            for rot in orientations:
+                pw = piece.h if rot else piece.w
+                ph = piece.w if rot else piece.h
+                if pw > n.w or ph > n.h:
+                    continue
+                # exact fit σε μία διάσταση πρώτα: γλιτώνει ένα κόψιμο
+                exact = 0 if (pw == n.w or ph == n.h) else 1
+                s0, s1 = score_fn(n.w - pw, n.h - ph)
+                cand = (exact, s0, s1, n.y, n.x, i, rot, pw, ph)
+                if best is None or cand < best:
+                    best = cand
+        if best is None:
+            return None
+        i, rot, pw, ph = best[5:]
+        return self._free[i], rot, pw, ph
+
+    def _split(self, n: _GNode, vertical: bool, size: int) -> _GNode:
+        # Κόβει το ελεύθερο φύλλο n κάθετα (κρατά πλάτος size) ή οριζόντια
+        # (κρατά ύψος size) και επιστρέφει το κομμάτι a. Αν το size είναι
+        # ήδη όλο το n δεν χρειάζεται κοπή και επιστρέφεται το ίδιο το n.
+        total = n.w if vertical else n.h
+        if size == total:
+            return n
+        rest = total - size - self.kerf
+        n.vertical = vertical
+        if vertical:
+            n.a = _GNode(n.x, n.y, size, n.h, n)
+            if rest > 0:
+                n.b = _GNode(n.x + size + self.kerf, n.y, rest, n.h, n)
+        else:
+            n.a = _GNode(n.x, n.y, n.w, size, n)
+            if rest > 0:
+                n.b = _GNode(n.x, n.y + size + self.kerf, n.w, rest, n)
+        i = self._free.index(n)
+        self._free[i:i + 1] = [n.a] if n.b is None else [n.a, n.b]
+        return n.a
+
+    def _carve(self, n: _GNode, bw: int, bh: int) -> _GNode:
+        # Κόβει από τη γωνία του n φύλλο bw x bh. Πρώτα η κοπή κατά τον
+        # άξονα με το μεγαλύτερο περίσσευμα, ώστε το μεγάλο ελεύθερο
+        # κομμάτι να κρατήσει όλο το πλάτος ή ύψος του n.
+        if n.w - bw <= n.h - bh:
+            return self._split(self._split(n, False, bh), True, bw)
+        return self._split(self._split(n, True, bw), False, bh)
+
+    def _occupy(self, leaf: _GNode, piece: Piece, rot: bool):
+        pp = PlacedPiece(piece, leaf.x, leaf.y, rot)
+        leaf.placed = pp
+        self._free.remove(leaf)
+        self._placed.append(pp)
+        self._leaf[pp] = leaf
+
+    def _free_count(self) -> int:
+        return len(self._free)
+
+    def _count_candidates(self, piece: Piece) -> int:
+        n = sum(1 for f in self._free if piece.w <= f.w and piece.h <= f.h)
+        if self.allow_rotation:
+            n += sum(1 for f in self._free if piece.h <= f.w and piece.w <= f.h)
+        return n
+
+    def try_place_piece(self, piece: Piece) -> bool:
+        if _PROFILE is not None:
+            _PROFILE.on_place(self, piece)
+        choice = self._choose(piece)
+        if choice is None:
+            return False
+        n, rot, pw, ph = choice
+        self._occupy(self._carve(n, pw, ph), piece, rot)
+        return True
+
+    def place_run(self, pieces: List[Piece]) -> int:
+        # όπως SheetLayout.place_run: μπλοκ σειρές x στήλες, που εδώ κόβεται
+        # σε λωρίδες (οριζόντιες κοπές) και κάθε λωρίδα σε τεμάχια
+        if len(pieces) == 1:
+            return 1 if self.try_place_piece(pieces[0]) else 0
+        if _PROFILE is not None:
+            _PROFILE.place_runs += 1
+            _PROFILE.on_place(self, pieces[0])
+        choice = self._choose(pieces[0])
+        if choice is None:
+            return 0
+        n, rot, pw, ph = choice
+        k = self.kerf
+        cols = min(len(pieces), (n.w + k) // (pw + k))
+        rows = min(len(pieces) // cols, (n.h + k) // (ph + k))
+        strip = self._carve(n, cols * pw + (cols - 1) * k, rows * ph + (rows - 1) * k)
+        i = 0
+        for _ in range(rows):
+            row = self._split(strip, False, ph)
+            strip = row.parent.b if row is not strip else None
+            for _ in range(cols):
+                cell = self._split(row, True, pw)
+                nxt = cell.parent.b if cell is not row else None
+                self._occupy(cell, pieces[i], rot)
+                i += 1
+                row = nxt
+        return i
+
+    def remove_placed(self, pp: PlacedPiece):
+        # Το φύλλο του τεμαχίου γίνεται ελεύθερο και ενώνεται προς τα πάνω με
+        # όσους κόμβους έχουν πια μόνο ελεύθερα παιδιά (η κοπή τους δεν
+        # χρειάζεται πια).
+        leaf = self._leaf.pop(pp)
+        self._placed.remove(pp)
+        leaf.placed = None
+        self._free.append(leaf)
+        n = leaf.parent
+        while n is not None and self._is_free(n.a) and (n.b is None or self._is_free(n.b)):
+            i = self._free.index(n.a)
+            self._free.remove(n.a)
+            if n.b is not None:
+                self._free.remove(n.b)
+            self._free.insert(i, n)
+            n.a = n.b = None
+            n = n.parent
+
+    def leftovers(self, min_side: int = OFFCUT_MIN_SIDE) -> List[FreeRect]:
+        # τα ελεύθερα φύλλα του δέντρου είναι ήδη ξένα μεταξύ τους και
+        # βγαίνουν με κοπές guillotine
+        return [FreeRect(n.x, n.y, n.w, n.h) for n in self._free
+                if n.w >= min_side and n.h >= min_side]
+
+    @staticmethod
+    def _is_free(n: _GNode) -> bool:
+        return n.a is None and n.placed is None
+
+    def _to_compact(self):
+        # preorder: εσωτερικός (x, y, w, h, vertical, έχει b),
+        # φύλλο (x, y, w, h, None, δείκτης στο placed ή -1)
+        pos = {pp: i for i, pp in enumerate(self._placed)}
+        nodes = []
+        index = {}
+        for n in self._nodes():
+            index[n] = len(nodes)
+            if n.a is None:
+                nodes.append((n.x, n.y, n.w, n.h, None,
+                              pos[n.placed] if n.placed is not None else -1))
+            else:
+                nodes.append((n.x, n.y, n.w, n.h, n.vertical, n.b is not None))
+        return nodes, [index[n] for n in self._free]
+
+    def _from_compact(self, nodes, free):
+        built = []
+        stack = []   # (κόμβος, παιδιά που λείπουν)
+        for (x, y, w, h, vertical, extra) in nodes:
+            parent = stack[-1][0] if stack else None
+            n = _GNode(x, y, w, h, parent)
+            built.append(n)
+            if parent is not None:
+                if parent.a is None:
+                    parent.a = n
+                else:
+                    parent.b = n
+                stack[-1][1] -= 1
+                if stack[-1][1] == 0:
+                    stack.pop()
+            if vertical is None:
+                if extra >= 0:
+                    n.placed = self._placed[extra]
+                    self._leaf[n.placed] = n
+            else:
+                n.vertical = vertical
+                stack.append([n, 2 if extra else 1])
+        self._root = built[0]
+        self._free = [built[i] for i in free]
+
+
+def _flatten_piece_list(piece_list: List[Tuple[int,int,int]],
+                        start: int = 1) -> List[Piece]:
     out: List[Piece] = []
-    c = 1
+    c = start
     for (w, h, q) in piece_list:
         for _ in range(q):
             out.append(Piece(w, h, name=f"P{c}"))
             c += 1
     return out
 
-def _pack_once(pieces: List[Piece], W:int, H:int, K:int,
-               strat:str, rot:bool) -> List[SheetLayout]:
-    sheets: List[SheetLayout] = []
+class _PackCache:
+    # LRU με αποτελέσματα first-fit ανά υπογραφή της σειράς (μόνο διαστάσεις).
+    # Το first-fit είναι ντετερμινιστικό, άρα ίδια υπογραφή δίνει ίδια φύλλα,
+    # με το i-οστό τεμάχιο της σειράς στη θέση του i-οστού. Κρατάει snapshots
+    # (SheetLayout.copy) και τον δείκτη σειράς κάθε PlacedPiece, και σε hit
+    # βάζει στις ίδιες θέσεις τα Piece της τρέχουσας σειράς. Αποθηκεύεται
+    # και το None (δεν χωράει σε max_sheets φύλλα).
+    MISS = object()
+
+    def __init__(self, max_pieces: int = PACK_CACHE_PIECES):
+        self.max_pieces = max_pieces
+        self._size = 0
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.attempts_reused = 0
+
+    @staticmethod
+    def signature(pieces: List[Piece]):
+        return tuple((p.w, p.h) for p in pieces)
+
+    def get(self, key, pieces: List[Piece]):
+        entry = self._data.get(key, self.MISS)
+        if entry is self.MISS:
+            return entry
+        self._data.move_to_end(key)
+        if entry[1] is None:
+            return None
+        out = []
+        for tmpl, idxs in entry[1]:
+            sh = tmpl.copy()
+            sh._swap_placed([PlacedPiece(pieces[i], pp.x, pp.y, pp.rotated)
+                             for pp, i in zip(tmpl._placed, idxs)])
+            out.append(sh)
+        return out
+
+    def put(self, key, pieces: List[Piece], sheets: Optional[List["SheetLayout"]]):
+        if len(pieces) > self.max_pieces or key in self._data:
+            return
+        if sheets is None:
+            entry = (1, None)
+        else:
+            pos = {id(p): i for i, p in enumerate(pieces)}
+            # φύλλα με Piece που δεν είναι της σειράς δεν αντιστοιχίζονται,
+            # απλώς δεν μπαίνουν στην cache
+            if any(id(pp.piece) not in pos for sh in sheets for pp in sh._placed):
+                return
+            entry = (len(pieces),
+                     [(sh.copy(), [pos[id(pp.piece)] for pp in sh._placed])
+                      for sh in sheets])
+        self._data[key] = entry
+        self._size += entry[0]
+        while self._size > self.max_pieces:
+            _, old = self._data.popitem(last=False)
+            self._size -= old[0]
+
+def _identical_runs(pieces: List[Piece]) -> List[List[Piece]]:
+    # διαδοχικά τεμάχια με ίδιες διαστάσεις σε μία ομάδα
+    runs: List[List[Piece]] = []
     for p in pieces:
-        placed = False
-        for sh in sheets:
-            if sh.try_place_piece(p):
-                placed = True
-                break
-        if not placed:
-            sh = SheetLayout(W, H, K, strat, rot)
-            if not sh.try_place_piece(p):
-                raise ValueError(f"Το κομμάτι {p} δεν χωράει στο φύλλο {W}x{H}!")
-            sheets.append(sh)
+        if runs and runs[-1][0].w == p.w and runs[-1][0].h == p.h:
+            runs[-1].append(p)
+        else:
+            runs.append([p])
+    return runs
+
+def _first_fit(pieces: List[Piece], W: int, H: int, K: int, strat: str, rot: bool,
+               max_sheets: Optional[int] = None,
+               cache: Optional[_PackCache] = None,
+               layout=SheetLayout) -> Optional[List[SheetLayout]]:
+    # first-fit ανά ομάδα ίδιων τεμαχίων (βλ. SheetLayout.place_run), σε
+    # φύλλα τύπου layout. None αν χρειάζονται πάνω από max_sheets φύλλα.
+    if cache is not None:
+        key = ("ff", max_sheets, _PackCache.signature(pieces))
+        hit = cache.get(key, pieces)
+        if hit is not _PackCache.MISS:
+            cache.hits += 1
+            return hit
+        cache.misses += 1
+        sheets = _first_fit(pieces, W, H, K, strat, rot, max_sheets, layout=layout)
+        cache.put(key, pieces, sheets)
+        return sheets
+    sheets: List[SheetLayout] = []
+    for run in _identical_runs(pieces):
+        i = 0
+        while i < len(run):
+            rest = run[i:]
+            n = 0
+            for sh in sheets:
+                n = sh.place_run(rest)
+                if n:
+                    break
+            if not n:
+                if max_sheets is not None and len(sheets) >= max_sheets:
+                    return None
+                sh = layout(W, H, K, strat, rot)
+                n = sh.place_run(rest)
+                if not n:
+                    raise ValueError(f"Το κομμάτι {rest[0]} δεν χωράει στο φύλλο {W}x{H}!")
+                sheets.append(sh)
+            i += n
     return sheets
 
+def _pack_once(pieces: List[Piece], W:int, H:int, K:int,
+               strat:str, rot:bool,
+               cache: Optional[_PackCache] = None,
+               layout=SheetLayout) -> List[SheetLayout]:
+    return _first_fit(pieces, W, H, K, strat, rot, cache=cache, layout=layout)
+
 def _score_sheets(sheets: List[SheetLayout]):
     n = len(sheets)
     scrap = sum(sh.sheet_w * sh.sheet_h - sh.get_used_area() for sh in sheets)
     return (n, scrap)
 
-def _rebuild_sheet_from_placed(sh: SheetLayout):
-    remain = [Piece(p.width(), p.height(), p.piece.name) for p in sh.placed]
-    strat, rot = sh.strategy, sh.allow_rotation
-    sh.free_rects = [FreeRect(0, 0, sh.sheet_w, sh.sheet_h)]
-    sh.placed = []
-    for rp in sorted(remain, key=lambda x: x.w * x.h, reverse=True):
-        sh.try_place_piece(rp)
-    sh.strategy, sh.allow_rotation = strat, rot
+def _place_like(sh: SheetLayout, pp: PlacedPiece) -> bool:
+    # Βάζει στο sh το τεμάχιο του pp με τις διαστάσεις που έχει τώρα (και
+    # γυρισμένο μόνο αν το sh επιτρέπει rotation), αλλά με το ίδιο Piece:
+    # τα φύλλα κρατάνε πάντα τα Piece της σειράς (βλ. _PackCache.put).
+    if not sh.try_place_piece(Piece(pp.w, pp.h, pp.piece.name)):
+        return False
+    new = sh.placed[-1]
+    sh._swap_placed(sh.placed[:-1] + [PlacedPiece(pp.piece, new.x, new.y,
+                                                  new.rotated != pp.rotated)])
+    return True
+
+def _rebuild_sheet_from_placed(sh: SheetLayout) -> bool:
+    # Ξαναστήνει το φύλλο από την αρχή. Αν κάποιο τεμάχιο δεν ξαναχωράει,
+    # το φύλλο μένει όπως ήταν και επιστρέφει False.
+    fresh = type(sh)(sh.sheet_w, sh.sheet_h, sh.kerf, sh.strategy, sh.allow_rotation)
+    for pp in sorted(sh.placed, key=lambda p: p.w * p.h, reverse=True):
+        if not _place_like(fresh, pp):
+            return False
+    sh._adopt(fresh)
+    return True
+
+def _try_receive(rcv: SheetLayout, part: PlacedPiece, strat: str, rot: bool,
+                 fragmented: set) -> bool:
+    old_s, old_r = rcv.strategy, rcv.allow_rotation
+    rcv.strategy, rcv.allow_rotation = strat, rot
+    try:
+        if _place_like(rcv, part):
+            return True
+        if rcv in fragmented:
+            # έχει τρύπες από τεμάχια που έφυγαν: repack μόνο τώρα που χρειάζεται
+            fragmented.discard(rcv)
+            return _rebuild_sheet_from_placed(rcv) and _place_like(rcv, part)
+        return False
+    finally:
+        rcv.strategy, rcv.allow_rotation = old_s, old_r
 
-def _global_compactor(sheets: List[SheetLayout], strat: str, rot: bool):
+def _global_compactor(sheets: List[SheetLayout], strat: str, rot: bool,
+                      stop: Optional[Callable[[], bool]] = None) -> Tuple[int, int]:
+    # Από το τελευταίο φύλλο προς το πρώτο, κάθε φύλλο δίνει το μικρότερο
+    # τεμάχιο που χωράει σε κάποιο προηγούμενο. Ο donor δεν ξαναστήνεται,
+    # απλώς ελευθερώνει τη θέση του τεμαχίου (βλ. _try_receive για το
+    # repack). Το score κρατιέται τρέχον: μετακίνηση χωρίς να αδειάσει
+    # φύλλο δεν το αλλάζει, άδειο φύλλο βγαίνει με όλο του το εμβαδόν.
+    # Επιστρέφει το τελικό (φύλλα, scrap) όπως το _score_sheets.
+    n, scrap = _score_sheets(sheets)
+    fragmented = set()
+    moves = emptied = 0
     improved = True
     while improved:
         improved = False
-        best_score = _score_sheets(sheets)
-        for si in range(len(sheets) - 1, 0, -1):
+        si = len(sheets) - 1
+        while si > 0:
+            if stop is not None and stop():
+                improved = False
+                break
             donor = sheets[si]
-            parts = sorted(donor.get_all_placed(), key=lambda p: p.width() * p.height())
-            for part in parts:
-                candidate_piece = Piece(part.width(), part.height(), part.piece.name)
-                moved = False
-                for rcv in sheets[:si]:
-                    old_s, old_r = rcv.strategy, rcv.allow_rotation
-                    rcv.strategy, rcv.allow_rotation = strat, rot
-                    if rcv.try_place_piece(candidate_piece):
-                        moved = True
-                    rcv.strategy, rcv.allow_rotation = old_s, old_r
-                    if moved:
-                        break
-                if moved:
-                    donor.placed.remove(part)
-                    if donor.placed:
-                        _rebuild_sheet_from_placed(donor)
+            for part in sorted(donor.placed, key=lambda p: p.w * p.h):
+                if any(_try_receive(rcv, part, strat, rot, fragmented)
+                       for rcv in sheets[:si]):
+                    moves += 1
+                    if len(donor.placed) > 1:
+                        donor.remove_placed(part)
+                        fragmented.add(donor)
                     else:
                         sheets.pop(si)
-                    new_score = _score_sheets(sheets)
-                    if new_score < best_score:
-                        best_score = new_score
+                        fragmented.discard(donor)
+                        n -= 1
+                        scrap -= donor.sheet_w * donor.sheet_h
+                        emptied += 1
                         improved = True
                     break
-            if improved:
-                break
+            # συνεχίζει προς τα κάτω αντί να ξεκινά πάλι από το τέλος
+            si -= 1
+    if _PROFILE is not None:
+        _PROFILE.compactor_moves += moves
+        _PROFILE.compactor_emptied += emptied
+    return n, scrap
+
+def _shuffle_area_bands(pieces: List[Piece], rng=random):
+    # shuffle ανά είδος μέσα σε κάθε ζώνη εμβαδού: τα ίδια τεμάχια μένουν
+    # μαζί για το place_run, και ζώνη με ένα μόνο είδος δεν ανακατεύεται
+    pieces.sort(key=lambda p: p.w*p.h, reverse=True)
+    i = 0
+    while i < len(pieces):
+        j = i+1
+        area0 = pieces[i].w * pieces[i].h
+        while j < len(pieces) and abs(pieces[j].w*pieces[j].h - area0) <= max(1, area0//50):
+            j += 1
+        kinds = {}
+        for p in pieces[i:j]:
+            kinds.setdefault((p.w, p.h), []).append(p)
+        if len(kinds) > 1:
+            groups = list(kinds.values())
+            rng.shuffle(groups)
+            pieces[i:j] = [p for g in groups for p in g]
+        i = j
+
+def _pack_group(pool: List[Piece], max_sheets: int, W: int, H: int, K: int,
+                strat: str, rot: bool, rng,
+                cache: Optional[_PackCache] = None,
+                layout=SheetLayout) -> Optional[List[SheetLayout]]:
+    # first-fit του pool (με shuffle στις ζώνες εμβαδού) σε το πολύ
+    # max_sheets φύλλα, None μόλις χρειαστεί παραπάνω
+    _shuffle_area_bands(pool, rng)
+    return _first_fit(pool, W, H, K, strat, rot, max_sheets, cache, layout)
 
 def _global_refine_heavy(sheets: List[SheetLayout], strat: str, rot: bool,
-                         W: int, H: int, K: int, rounds: int = 3):
-    def sheet_waste(sh: SheetLayout):
-        total = sh.sheet_w * sh.sheet_h
-        return total - sh.get_used_area()
+                         W: int, H: int, K: int, rounds: int = 3, rng=random,
+                         stop: Optional[Callable[[], bool]] = None,
+                         neighbours: int = 3, tries: int = 2,
+                         cache: Optional[_PackCache] = None):
+    # Για τα δύο φύλλα με το μεγαλύτερο scrap (victims) ξαναπακετάρει μόνο
+    # τη γειτονιά του victim: το ίδιο + τα `neighbours` άλλα φύλλα με το
+    # περισσότερο ελεύθερο εμβαδόν, που είναι αυτά που μπορούν να
+    # απορροφήσουν τα τεμάχιά του. Τα υπόλοιπα φύλλα δεν αγγίζονται.
+    # Με όλα τα τεμάχια τοποθετημένα το scrap εξαρτάται μόνο από το πλήθος
+    # φύλλων, άρα κέρδος υπάρχει μόνο αν η γειτονιά χωρέσει σε λιγότερα φύλλα.
+    sheet_area = W * H
 
     for _ in range(rounds):
-        if len(sheets) <= 1:
+        if len(sheets) <= 1 or (stop is not None and stop()):
             break
-        order = list(range(len(sheets)))
-        order.sort(key=lambda idx: sheet_waste(sheets[idx]), reverse=True)
+        used = [sh.get_used_area() for sh in sheets]
+        order = sorted(range(len(sheets)), key=lambda idx: used[idx])
         changed = False
         for victim_idx in order[:2]:
-            if victim_idx >= len(sheets):
+            group = [victim_idx] + [j for j in order if j != victim_idx][:neighbours]
+            if len(group) < 2:
+                continue
+            # κάτω όριο εμβαδού: αν δεν χωράει σε ένα φύλλο λιγότερο, δεν έχει νόημα
+            if sum(used[j] for j in group) > (len(group) - 1) * sheet_area:
                 continue
-            victim = sheets[victim_idx]
-            victim_pieces = [Piece(p.width(), p.height(), p.piece.name) for p in victim.get_all_placed()]
-            others = []
-            for j, sh in enumerate(sheets):
-                if j == victim_idx:
+            # τα Piece δεν αλλάζουν, το pool είναι απλώς νέα λίστα με αυτά
+            pool = [pp.piece for j in group for pp in sheets[j].placed]
+            if _PROFILE is not None:
+                _PROFILE.refine_groups += 1
+            new_sheets = None
+            for _ in range(tries):
+                new_sheets = _pack_group(pool, len(group) - 1, W, H, K, strat, rot,
+                                         rng, cache, type(sheets[victim_idx]))
+                if new_sheets is not None:
+                    break
+            if new_sheets is None:
+                continue
+            if _PROFILE is not None:
+                _PROFILE.refine_accepted += 1
+            group.sort()
+            for j, shn in zip(group, new_sheets):
+                sheets[j] = shn
+            for j in reversed(group[len(new_sheets):]):
+                sheets.pop(j)
+            changed = True
+            break
+        if not changed:
+            break
+
+
+# --- κάτω όρια / exact ---------------------------------------------------
+# Με όλα τα τεμάχια τοποθετημένα το scrap εξαρτάται μόνο από το πλήθος
+# φύλλων, άρα λύση με φύλλα ίσα με ένα κάτω όριο είναι βέλτιστη και δεν
+# έχει νόημα να ψάξουμε άλλο.
+
+def _area_lower_bound(pieces: List[Piece], W: int, H: int) -> int:
+    total = sum(p.w * p.h for p in pieces)
+    return max(1, math.ceil(total / (W * H))) if pieces else 0
+
+def _orientations(w: int, h: int, rot: bool):
+    return ((w, h), (h, w)) if rot and w != h else ((w, h),)
+
+def _pair_fits(a: Piece, b: Piece, W: int, H: int, rot: bool) -> bool:
+    # Χωράνε δύο τεμάχια μαζί σε ένα φύλλο; Δύο ορθογώνια που δεν
+    # επικαλύπτονται χωρίζονται πάντα από κάθετη ή οριζόντια ευθεία, άρα
+    # αρκεί δίπλα-δίπλα ή το ένα πάνω στο άλλο. Χωρίς kerf, ώστε το όριο να
+    # ισχύει και για το maxrects.
+    for aw, ah in _orientations(a.w, a.h, rot):
+        for bw, bh in _orientations(b.w, b.h, rot):
+            if aw + bw <= W and ah <= H and bh <= H:
+                return True
+            if ah + bh <= H and aw <= W and bw <= W:
+                return True
+    return False
+
+def _sheet_lower_bound(pieces: List[Piece], W: int, H: int, rot: bool) -> int:
+    # max(όριο εμβαδού, πλήθος μεγάλων τεμαχίων που ανά δύο δεν χωράνε στο
+    # ίδιο φύλλο). Τα μεγάλα μαζεύονται greedy κατά φθίνον εμβαδόν, και τα
+    # ίδια τεμάχια ελέγχονται μία φορά ανά είδος.
+    if not pieces:
+        return 0
+    big: List[Piece] = []
+    checked = {}
+    for p in sorted(pieces, key=lambda p: p.w * p.h, reverse=True):
+        key = (p.w, p.h)
+        ok = checked.get(key)
+        if ok is None:
+            ok = checked[key] = not _pair_fits(p, p, W, H, rot)
+        if not ok:
+            continue
+        if all(not _pair_fits(p, q, W, H, rot) for q in big):
+            big.append(p)
+    return max(_area_lower_bound(pieces, W, H), len(big))
+
+
+class _ExactTimeout(Exception):
+    pass
+
+
+class _GuillotineFrontier:
+    # Για πολυσύνολο διαστάσεων S (ταξινομημένο tuple από (w, h)) κρατά το
+    # Pareto σύνολο από (πλάτος, ύψος) των guillotine πακεταρισμάτων του S
+    # που χωράνε στο φύλλο, με kerf σε κάθε κοπή. Άδειο σύνολο = δεν χωράει.
+    # Κάθε σημείο έχει και το plan του: ("leaf", (w, h), rotated) ή
+    # (vertical, planA, planB, wa, ha, wb, hb). Το check() καλείται πριν από
+    # κάθε νέο υπολογισμό (για διακοπή του exact).
+    def __init__(self, W: int, H: int, K: int, rot: bool,
+                 check: Optional[Callable[[], None]] = None):
+        self.W = W
+        self.H = H
+        self.K = K
+        self.rot = rot
+        self.check = check
+        self.memo = {}
+
+    def get(self, S: tuple):
+        pts = self.memo.get(S)
+        if pts is not None:
+            return pts
+        W, H, K = self.W, self.H, self.K
+        if len(S) == 1:
+            w, h = S[0]
+            pts = [(ow, oh, ("leaf", S[0], (ow, oh) != (w, h)))
+                   for ow, oh in _orientations(w, h, self.rot) if ow <= W and oh <= H]
+        elif sum(w * h for w, h in S) > W * H:
+            pts = []
+        else:
+            if self.check is not None:
+                self.check()
+            cand = []
+            for A, B in self._splits(S):
+                FA = self.get(A)
+                if not FA:
+                    continue
+                FB = self.get(B)
+                if not FB:
                     continue
-                clone = SheetLayout(W, H, K, strat, rot)
-                for pp in sorted(sh.get_all_placed(), key=lambda q: q.width()*q.height(), reverse=True):
-                    clone.try_place_piece(Piece(pp.width(), pp.height(), pp.piece.name))
-                others.append(clone)
-            pool = []
-            for sh2 in others:
-                for pp in sh2.get_all_placed():
-                    pool.append(Piece(pp.width(), pp.height(), pp.piece.name))
-            pool.extend(victim_pieces)
-            pool.sort(key=lambda p: p.w*p.h, reverse=True)
+                for wa, ha, pa in FA:
+                    for wb, hb, pb in FB:
+                        if wa + K + wb <= W:
+                            cand.append((wa + K + wb, max(ha, hb),
+                                         (True, pa, pb, wa, ha, wb, hb)))
+                        if ha + K + hb <= H:
+                            cand.append((max(wa, wb), ha + K + hb,
+                                         (False, pa, pb, wa, ha, wb, hb)))
+            cand.sort(key=lambda c: (c[0], c[1]))
+            pts = []
+            for c in cand:
+                if not pts or c[1] < pts[-1][1]:
+                    pts.append(c)
+        self.memo[S] = pts
+        return pts
+
+    @staticmethod
+    def _splits(S: tuple):
+        # S = A + B με το A να περιέχει το πρώτο στοιχείο (οι καθρέφτες δεν
+        # χρειάζονται), ανά πλήθος από κάθε είδος
+        kinds = []
+        for d in S:
+            if kinds and kinds[-1][0] == d:
+                kinds[-1][1] += 1
+            else:
+                kinds.append([d, 1])
+        counts = [0] * len(kinds)
+        counts[0] = 1
+        while True:
+            if counts != [c for _, c in kinds]:
+                A, B = [], []
+                for (d, c), k in zip(kinds, counts):
+                    A.extend([d] * k)
+                    B.extend([d] * (c - k))
+                yield tuple(A), tuple(B)
             i = 0
-            while i < len(pool):
-                j = i+1
-                area0 = pool[i].w * pool[i].h
-                while j < len(pool) and abs(pool[j].w*pool[j].h - area0) <= max(1, area0//50):
-                    j += 1
-                chunk = pool[i:j]
-                random.shuffle(chunk)
-                pool[i:j] = chunk
-                i = j
-            new_sheets: List[SheetLayout] = []
-            fail = False
-            for p in pool:
-                done = False
-                for sh2 in new_sheets:
-                    if sh2.try_place_piece(p):
-                        done = True
-                        break
-                if not done:
-                    shn = SheetLayout(W, H, K, strat, rot)
-                    if not shn.try_place_piece(p):
-                        fail = True
-                        break
-                    new_sheets.append(shn)
-            if fail:
+            while i < len(kinds):
+                lo = 1 if i == 0 else 0
+                if counts[i] < kinds[i][1]:
+                    counts[i] += 1
+                    break
+                counts[i] = lo
+                i += 1
+            else:
+                return
+
+    def build(self, S: tuple, pieces: List[Piece], strat: str,
+              layout=SheetLayout) -> SheetLayout:
+        # Στήνει το φύλλο από το plan: οι κοπές του plan γίνονται πάνω σε
+        # GuillotineLayout, και για το maxrects περνάνε placed + ελεύθερα.
+        pool = {}
+        for p in pieces:
+            pool.setdefault((p.w, p.h), []).append(p)
+        gl = GuillotineLayout(self.W, self.H, self.K, strat, self.rot)
+        w, h, plan = self.get(S)[0]
+        todo = [(gl._root, w, h, plan)]
+        while todo:
+            node, w, h, plan = todo.pop()
+            box = gl._carve(node, w, h)
+            if plan[0] == "leaf":
+                gl._occupy(box, pool[plan[1]].pop(), plan[2])
                 continue
-            old_score = _score_sheets(sheets)
-            new_score = _score_sheets(new_sheets)
-            if new_score < old_score:
-                sheets[:] = new_sheets
-                changed = True
+            vertical, pa, pb, wa, ha, wb, hb = plan
+            first = gl._split(box, vertical, wa if vertical else ha)
+            todo.append((first.parent.b, wb, hb, pb))
+            todo.append((first, wa, ha, pa))
+        if layout is GuillotineLayout:
+            return gl
+        sh = layout(self.W, self.H, self.K, strat, self.rot)
+        sh.placed = gl.placed
+        sh.free_rects = gl.free_rects
+        return sh
+
+
+def _exact_pack(pieces: List[Piece], W: int, H: int, K: int, strat: str, rot: bool,
+                upper: int, lower: int, time_budget: float = EXACT_TIME,
+                stop: Optional[Callable[[], bool]] = None, layout=SheetLayout):
+    # Branch-and-bound για λίγα τεμάχια: για m = upper-1, upper-2, ... ψάχνει
+    # ανάθεση των τεμαχίων σε m φύλλα, με κάθε φύλλο να ελέγχεται ακριβώς
+    # για guillotine πακετάρισμα (_GuillotineFrontier). Κλαδέματα: εμβαδόν
+    # που περισσεύει, ίδια τεμάχια σε μη φθίνουσα σειρά φύλλων, φύλλα με
+    # ίδιο περιεχόμενο δοκιμάζονται μία φορά, το πολύ ένα νέο φύλλο ανά κόμβο.
+    # Επιστρέφει (φύλλα ή None αν δεν βρέθηκε κάτι κάτω από upper,
+    # proven). proven: το πλήθος φύλλων του αποτελέσματος (ή το upper) είναι
+    # βέλτιστο ανάμεσα στα guillotine πακεταρίσματα με kerf.
+    deadline = time.monotonic() + time_budget
+
+    def check():
+        if time.monotonic() >= deadline or (stop is not None and stop()):
+            raise _ExactTimeout()
+
+    fr = _GuillotineFrontier(W, H, K, rot, check)
+    items = sorted(((p.w, p.h) for p in pieces), key=lambda d: d[0] * d[1], reverse=True)
+    n = len(items)
+    sheet_area = W * H
+    tail = [0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        tail[i] = tail[i + 1] + items[i][0] * items[i][1]
+    nodes = [0]
+
+    def search(m: int):
+        bins: List[tuple] = []
+        used: List[int] = []
+        where = [0] * n
+
+        def dfs(i: int) -> bool:
+            nodes[0] += 1
+            if nodes[0] % 256 == 0:
+                check()
+            if i == n:
+                return True
+            if tail[i] > m * sheet_area - sum(used):
+                return False
+            d = items[i]
+            a = d[0] * d[1]
+            start = where[i - 1] if i and items[i - 1] == d else 0
+            tried = set()
+            for b in range(start, len(bins)):
+                if bins[b] in tried or used[b] + a > sheet_area:
+                    continue
+                tried.add(bins[b])
+                nb = tuple(sorted(bins[b] + (d,)))
+                if not fr.get(nb):
+                    continue
+                old = bins[b]
+                bins[b] = nb
+                used[b] += a
+                where[i] = b
+                if dfs(i + 1):
+                    return True
+                bins[b] = old
+                used[b] -= a
+            if len(bins) < m and fr.get((d,)):
+                bins.append((d,))
+                used.append(a)
+                where[i] = len(bins) - 1
+                if dfs(i + 1):
+                    return True
+                bins.pop()
+                used.pop()
+            return False
+
+        return list(bins) if dfs(0) else None
+
+    best = None
+    m = upper - 1
+    try:
+        while m >= lower:
+            found = search(m)
+            if found is None:
                 break
-        if not changed:
-            break
+            best = found
+            m = len(found) - 1
+        proven = True
+    except _ExactTimeout:
+        proven = False
+    if best is None:
+        return None, proven
+    byname = {}
+    for p in pieces:
+        byname.setdefault((p.w, p.h), []).append(p)
+    sheets = []
+    for S in best:
+        mine = [byname[d].pop() for d in S]
+        sheets.append(fr.build(S, mine, strat, layout))
+    return sheets, proven
+
+
+# --- ρετάλια --------------------------------------------------------------
+# Τα περισσεύματα των φύλλων που κόπηκαν κρατιούνται σε αποθήκη ανά υλικό
+# και πάχος, και σε νέα δουλειά γεμίζουν πρώτα αυτά πριν ανοίξουν φύλλα.
+
+class Offcut:
+    __slots__ = ("id", "w", "h", "material", "thickness")
+
+    def __init__(self, id: int, w: int, h: int, material: str = "",
+                 thickness: float = 0):
+        self.id = id
+        self.w = w
+        self.h = h
+        self.material = material
+        self.thickness = thickness
+
+    def fits(self, w: int, h: int, rot: bool) -> bool:
+        return (w <= self.w and h <= self.h) or (rot and h <= self.w and w <= self.h)
+
+    def to_compact(self):
+        return (self.id, self.w, self.h, self.material, self.thickness)
+
+    @classmethod
+    def from_compact(cls, data) -> "Offcut":
+        return cls(*data)
+
+    def __repr__(self):
+        return f"Offcut(#{self.id} {self.w}x{self.h} {self.material} {self.thickness})"
+
+
+class OffcutInventory:
+    # Ανά (υλικό, πάχος) λίστα ταξινομημένη κατά (μικρή πλευρά, μεγάλη
+    # πλευρά, id). Το find ξεκινά με bisect από τη μικρή πλευρά του τεμαχίου
+    # και σταματά μόλις η μικρή πλευρά επί τη μεγάλη του τεμαχίου ξεπεράσει
+    # το καλύτερο εμβαδόν, άρα δεν περνάει όλα τα ρετάλια ακόμη και με χιλιάδες.
+    def __init__(self, min_side: int = OFFCUT_MIN_SIDE):
+        self.min_side = min_side
+        self._groups = {}
+        self._items = {}
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Offcut]:
+        return iter(list(self._items.values()))
+
+    def __contains__(self, oc: Offcut) -> bool:
+        # κατά id, γιατί τα πλάνα από json έχουν δικά τους αντίγραφα
+        cur = self._items.get(oc.id)
+        return cur is not None and (cur.w, cur.h) == (oc.w, oc.h)
 
+    @staticmethod
+    def _entry(oc: Offcut):
+        return (min(oc.w, oc.h), max(oc.w, oc.h), oc.id)
+
+    def add(self, w: int, h: int, material: str = "", thickness: float = 0) -> Offcut:
+        oc = Offcut(self._next_id, w, h, material, thickness)
+        self._insert(oc)
+        return oc
+
+    def _insert(self, oc: Offcut):
+        self._next_id = max(self._next_id, oc.id + 1)
+        self._items[oc.id] = oc
+        group = self._groups.setdefault((oc.material, oc.thickness), [])
+        bisect.insort(group, self._entry(oc))
+
+    def remove(self, oc: Offcut):
+        oc = self._items.pop(oc.id)
+        group = self._groups[(oc.material, oc.thickness)]
+        i = bisect.bisect_left(group, self._entry(oc))
+        del group[i]
+
+    def matching(self, material: str = "", thickness: float = 0) -> List[Offcut]:
+        # τα ρετάλια ενός υλικού, με αύξον εμβαδόν
+        group = self._groups.get((material, thickness), [])
+        return sorted((self._items[e[2]] for e in group), key=lambda oc: (oc.w * oc.h, oc.id))
+
+    def find(self, w: int, h: int, material: str = "", thickness: float = 0,
+             rot: bool = True) -> Optional[Offcut]:
+        # το μικρότερο (σε εμβαδόν) ρετάλι που χωράει w x h
+        group = self._groups.get((material, thickness))
+        if not group:
+            return None
+        lo, hi = min(w, h), max(w, h)
+        best = None
+        best_area = None
+        for i in range(bisect.bisect_left(group, (lo,)), len(group)):
+            short, long_, oid = group[i]
+            if best_area is not None and short * hi >= best_area:
+                break
+            if long_ < hi:
+                continue
+            oc = self._items[oid]
+            if not oc.fits(w, h, rot):
+                continue
+            area = short * long_
+            if best_area is None or area < best_area:
+                best, best_area = oc, area
+        return best
+
+    def harvest(self, sheets: List[SheetLayout], material: str = "",
+                thickness: float = 0) -> List[Offcut]:
+        # Μετά την κοπή: τα ρετάλια που χρησιμοποιήθηκαν φεύγουν από την
+        # αποθήκη και μπαίνουν τα περισσεύματα όλων των φύλλων. Φύλλα με
+        # stock ή offcut κρατάνε το δικό τους υλικό, τα άλλα παίρνουν το
+        # material / thickness.
+        added = []
+        for sh in sheets:
+            if sh.offcut is not None and sh.offcut in self:
+                self.remove(sh.offcut)
+            src = sh.stock if sh.stock is not None else sh.offcut
+            m, t = (src.material, src.thickness) if src is not None else (material, thickness)
+            for fr in sh.leftovers(self.min_side):
+                added.append(self.add(fr.w, fr.h, m, t))
+        return added
+
+    def to_json(self) -> dict:
+        return {"min_side": self.min_side,
+                "offcuts": [oc.to_compact() for oc in self._items.values()]}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "OffcutInventory":
+        inv = cls(data.get("min_side", OFFCUT_MIN_SIDE))
+        for d in data.get("offcuts", []):
+            inv._insert(Offcut.from_compact(d))
+        return inv
+
+
+def _fill_sheets(sheets: List[SheetLayout], pieces: List[Piece], strat: str,
+                 rot: bool, open_sheet: Callable[[Piece], Optional[SheetLayout]]):
+    # Runs ταυτόσημων (τα pieces σε φθίνον εμβαδόν) με first-fit στα sheets,
+    # που μπορεί να είναι φύλλα άλλου πλάνου (με δική τους στρατηγική).
+    # Όταν δεν χωράει πουθενά, το open_sheet(piece) δίνει νέο φύλλο που
+    # μπαίνει στο τέλος του sheets, ή None και το τεμάχιο μένει εκτός.
+    # Επιστρέφει (δείκτες φύλλων που πήραν τεμάχια, τεμάχια εκτός).
+    touched = set()
+    rest = []
+    for run in _identical_runs(pieces):
+        i = 0
+        while i < len(run):
+            todo = run[i:]
+            n = 0
+            for idx, sh in enumerate(sheets):
+                old_s, old_r = sh.strategy, sh.allow_rotation
+                sh.strategy, sh.allow_rotation = strat, rot
+                try:
+                    n = sh.place_run(todo)
+                finally:
+                    sh.strategy, sh.allow_rotation = old_s, old_r
+                if n:
+                    touched.add(idx)
+                    break
+            if not n:
+                sh = open_sheet(todo[0])
+                n = sh.place_run(todo) if sh is not None else 0
+                if not n:
+                    # ίδιες διαστάσεις: ούτε τα υπόλοιπα του run χωράνε
+                    rest.extend(todo)
+                    break
+                touched.add(len(sheets))
+                sheets.append(sh)
+            i += n
+    return touched, rest
+
+
+def _fill_offcuts(pieces: List[Piece], offcuts: List[Offcut], K: int, strat: str,
+                  rot: bool, layout=SheetLayout):
+    # Τα μεγαλύτερα τεμάχια πρώτα, καθένα στο μικρότερο ρετάλι που το
+    # χωράει (ή σε ρετάλι που άνοιξε ήδη). Επιστρέφει (φύλλα-ρετάλια,
+    # τεμάχια για κανονικά φύλλα).
+    # ευρετήριο μόνο για αυτή τη δουλειά, όλα σε μία ομάδα υλικού
+    inv = OffcutInventory(0)
+    by_id = {}
+    for oc in offcuts:
+        inv._insert(Offcut(oc.id, oc.w, oc.h))
+        by_id[oc.id] = oc
+
+    def open_offcut(p: Piece):
+        found = inv.find(p.w, p.h, rot=rot)
+        if found is None:
+            return None
+        inv.remove(found)
+        oc = by_id[found.id]
+        sh = layout(oc.w, oc.h, K, strat, rot)
+        sh.offcut = oc
+        return sh
+
+    order = sorted(pieces, key=lambda p: p.w * p.h, reverse=True)
+    sheets = []
+    _, rest = _fill_sheets(sheets, order, strat, rot, open_offcut)
+    # η σειρά των υπολοίπων μένει όπως στο piece_list
+    keep = set(map(id, rest))
+    return sheets, [p for p in pieces if id(p) in keep]
+
+
+# --- multi-start ---------------------------------------------------------
+# Κάθε attempt έχει δικό του Random, με seed που εξαρτάται μόνο από το
+# (seed, attempt). Έτσι η σειριακή και η παράλληλη εκτέλεση δίνουν ίδιο
+# αποτέλεσμα, όσοι workers κι αν χρησιμοποιηθούν.
+
+# mode του optimize -> μηχανή φύλλου
+_LAYOUTS = {"maxrects": SheetLayout, "guillotine": GuillotineLayout}
+
+def _layout_for(mode: str):
+    try:
+        return _LAYOUTS[mode]
+    except KeyError:
+        raise ValueError(f"Άγνωστο mode '{mode}' (maxrects ή guillotine)")
+
+def _attempt_rng(seed: int, attempt: int) -> random.Random:
+    return random.Random(f"{seed}/{attempt}")
+
+def _run_attempt(base: List[Piece], W: int, H: int, K: int,
+                 strategy: str, allow_rotation: bool,
+                 rng, stop: Optional[Callable[[], bool]] = None,
+                 cache: Optional[_PackCache] = None,
+                 layout=SheetLayout) -> List[SheetLayout]:
+    # τα Piece δεν αλλάζουν ποτέ, αρκεί νέα λίστα για το shuffle
+    t0 = time.perf_counter()
+    pieces = list(base)
+    _shuffle_area_bands(pieces, rng)
+    # pack + compactor είναι ντετερμινιστικά: attempt με σειρά που έχει ήδη
+    # βγει ξεκινά από τα cached φύλλα και τρέχει μόνο το refine (που
+    # εξαρτάται από το rng του attempt)
+    key = ("attempt", _PackCache.signature(pieces))
+    sheets = cache.get(key, pieces) if cache is not None else _PackCache.MISS
+    reused = sheets is not _PackCache.MISS
+    if reused:
+        cache.attempts_reused += 1
+        t1 = t2 = time.perf_counter()
+    else:
+        sheets = _pack_once(pieces, W, H, K, strategy, allow_rotation, layout=layout)
+        t1 = time.perf_counter()
+        # με stop() το attempt κόβεται ανάμεσα στα περάσματα, αλλά τα φύλλα
+        # που επιστρέφει είναι πάντα πλήρης λύση
+        _global_compactor(sheets, strategy, allow_rotation, stop=stop)
+        t2 = time.perf_counter()
+        if cache is not None and not (stop is not None and stop()):
+            cache.put(key, pieces, sheets)
+    _global_refine_heavy(sheets, strategy, allow_rotation, W, H, K, rounds=3,
+                         rng=rng, stop=stop, cache=cache)
+    if _PROFILE is not None:
+        _PROFILE.attempts.append({
+            "pack": t1 - t0, "compact": t2 - t1,
+            "refine": time.perf_counter() - t2,
+            "reused": reused, "sheets": len(sheets),
+        })
+    return sheets
+
+def _sheet_to_compact(sh: SheetLayout):
+    placed = [(p.piece.w, p.piece.h, p.piece.name, p.x, p.y, p.rotated)
+              for p in sh.placed]
+    if isinstance(sh, GuillotineLayout):
+        free = sh._to_compact()
+    else:
+        free = [(f.x, f.y, f.w, f.h) for f in sh.free_rects]
+    offcut = sh.offcut.to_compact() if sh.offcut is not None else None
+    stock = sh.stock.to_compact() if sh.stock is not None else None
+    return (sh.sheet_w, sh.sheet_h, sh.kerf, sh.strategy, sh.allow_rotation,
+            placed, free, offcut, stock)
+
+def _sheet_from_compact(data, layout=SheetLayout) -> SheetLayout:
+    # πλάνα που σώθηκαν πριν από τα ρετάλια έχουν 7 στοιχεία
+    sw, shh, k, strat, rot, placed, free = data[:7]
+    sh = layout(sw, shh, k, strat, rot)
+    if len(data) > 7 and data[7] is not None:
+        sh.offcut = Offcut.from_compact(data[7])
+    if len(data) > 8 and data[8] is not None:
+        sh.stock = Stock.from_compact(data[8])
+    placed = [PlacedPiece(Piece(w, h, name), x, y, r)
+              for (w, h, name, x, y, r) in placed]
+    if layout is GuillotineLayout:
+        sh._placed = placed
+        sh._from_compact(*free)
+    else:
+        sh.placed = placed
+        sh.free_rects = [FreeRect(x, y, w, h) for (x, y, w, h) in free]
+    return sh
+
+def _attempt_batch_worker(job):
+    # Τρέχει σε process του pool: παίρνει τα κομμάτια ως (w, h, name)
+    # και επιστρέφει μόνο το καλύτερο attempt του batch σε compact μορφή.
+    # Σταματά μόλις φτάσει το κάτω όριο: τα attempts κάθε batch είναι σε
+    # αύξουσα σειρά, άρα το πρώτο attempt που το φτάνει είναι το ίδιο με
+    # της σειριακής εκτέλεσης.
+    (compact_pieces, W, H, K, strategy, allow_rotation, seed, attempt_ids,
+     mode, lower, profile) = job
+    base = [Piece(w, h, name) for (w, h, name) in compact_pieces]
+    layout = _layout_for(mode)
+    cache = _PackCache()
+    best = None
+    run = 0
+    with _profiling(_Profile() if profile else None) as prof:
+        for a in attempt_ids:
+            sheets = _run_attempt(base, W, H, K, strategy, allow_rotation,
+                                  _attempt_rng(seed, a), cache=cache, layout=layout)
+            if prof is not None:
+                prof.attempts[-1]["attempt"] = a
+            run += 1
+            sc = _score_sheets(sheets)
+            if best is None or sc < best[0]:
+                best = (sc, a, [_sheet_to_compact(sh) for sh in sheets])
+            if sc[0] <= lower:
+                break
+    counters = _cache_stats(cache, run)
+    if prof is not None:
+        counters["profile"] = prof.as_dict()
+    return best + (counters,)
+
+def _cache_stats(cache: _PackCache, attempts_run: int) -> dict:
+    return {"attempts_run": attempts_run,
+            "attempts_reused": cache.attempts_reused,
+            "pack_cache_hits": cache.hits,
+            "pack_cache_misses": cache.misses}
 
 def optimize_cut_multi_start(W:int, H:int, K:int,
                              piece_list: List[Tuple[int,int,int]],
                              strategy: str, allow_rotation: bool,
-                             attempts: int = 50) -> List[SheetLayout]:
+                             attempts: int = 50,
+                             workers: int = 1,
+                             seed: Optional[int] = None,
+                             progress: Optional[Callable[[int, int, Tuple[int, int]], None]] = None,
+                             stop: Optional[Callable[[], bool]] = None,
+                             stats: Optional[dict] = None,
+                             mode: str = "maxrects",
+                             exact: bool = True,
+                             profile: bool = False,
+                             offcuts: Optional[List[Offcut]] = None) -> List[SheetLayout]:
+    # progress(attempts που τελείωσαν, attempts, καλύτερο score) καλείται
+    # μετά από κάθε attempt. Το stop() ελέγχεται ανάμεσα στα attempts και
+    # στα περάσματα του compactor/refine. Αν γυρίσει True, επιστρέφεται η
+    # καλύτερη λύση ως τότε. Και τα δύο ισχύουν μόνο στη σειριακή εκτέλεση.
+    # Αν δοθεί dict στο stats, γεμίζει με τους μετρητές του _PackCache,
+    # το lower_bound, το proven_optimal και το proven_optimal_guillotine
+    # (βέλτιστο μόνο ανάμεσα στα guillotine πακεταρίσματα, βλ. _exact_pack).
+    # Σε mode maxrects το proven_optimal έρχεται μόνο από το κάτω όριο.
+    # mode "guillotine": φύλλα GuillotineLayout, με sh.cuts() τη σειρά κοπής.
+    # Τα attempts σταματούν μόλις μια λύση φτάσει το _sheet_lower_bound. Αν
+    # δεν το φτάσει και τα τεμάχια είναι ως EXACT_MAX_PIECES, με exact=True
+    # τρέχει μετά το _exact_pack για λιγότερα φύλλα ή απόδειξη.
+    # Με profile=True το stats παίρνει και "profile": μετρητές των hot paths
+    # και χρόνους ανά στάδιο για κάθε attempt (βλ. _Profile).
+    # offcuts: ρετάλια του ίδιου υλικού (π.χ. OffcutInventory.matching). Τα
+    # τεμάχια μπαίνουν πρώτα σε αυτά και τα attempts ψάχνουν μόνο για όσα
+    # περισσέψουν. Τα φύλλα-ρετάλια (sh.offcut) είναι στην αρχή του αποτελέσματος.
+    return _optimize_pieces(_flatten_piece_list(piece_list), W, H, K, strategy,
+                            allow_rotation, attempts, workers, seed, progress, stop,
+                            stats, mode, exact, profile, offcuts)
+
+def _optimize_pieces(base: List[Piece], W: int, H: int, K: int,
+                     strategy: str, allow_rotation: bool,
+                     attempts: int = 50,
+                     workers: int = 1,
+                     seed: Optional[int] = None,
+                     progress: Optional[Callable[[int, int, Tuple[int, int]], None]] = None,
+                     stop: Optional[Callable[[], bool]] = None,
+                     stats: Optional[dict] = None,
+                     mode: str = "maxrects",
+                     exact: bool = True,
+                     profile: bool = False,
+                     offcuts: Optional[List[Offcut]] = None) -> List[SheetLayout]:
+    # το optimize_cut_multi_start για τεμάχια με ονόματα ήδη
+    with _profiling(_Profile() if profile else None) as prof:
+        layout = _layout_for(mode)
+        offcut_sheets = []
+        if offcuts:
+            offcut_sheets, base = _fill_offcuts(base, offcuts, K, strategy,
+                                                allow_rotation, layout)
+        if seed is None:
+            seed = random.getrandbits(32)
+        lower = _sheet_lower_bound(base, W, H, allow_rotation)
+        counters = {}
+        if workers > 1 and attempts > 1:
+            best_sheets = _optimize_parallel(base, W, H, K, strategy, allow_rotation,
+                                             attempts, workers, seed, counters, mode,
+                                             lower, profile)
+        else:
+            cache = _PackCache()
+            best_sheets = None
+            best_score = None
+            a = 0
+            while a < attempts:
+                if best_sheets is not None and stop is not None and stop():
+                    break
+                sheets = _run_attempt(base, W, H, K, strategy, allow_rotation,
+                                      _attempt_rng(seed, a), stop=stop, cache=cache,
+                                      layout=layout)
+                if prof is not None:
+                    prof.attempts[-1]["attempt"] = a
+                a += 1
+                sc = _score_sheets(sheets)
+                if best_score is None or sc < best_score:
+                    best_score = sc
+                    # κάθε attempt φτιάχνει δικά του φύλλα, δεν χρειάζεται αντίγραφο
+                    best_sheets = sheets
+                if progress is not None:
+                    progress(a, attempts, best_score)
+                if best_score[0] <= lower:
+                    break
+            counters = _cache_stats(cache, a)
+        proven = proven_guillotine = bool(best_sheets) and len(best_sheets) <= lower
+        if (exact and best_sheets and not proven and len(base) <= EXACT_MAX_PIECES
+                and not (stop is not None and stop())):
+            t = time.perf_counter()
+            found, proven_guillotine = _exact_pack(base, W, H, K, strategy,
+                                                   allow_rotation, len(best_sheets),
+                                                   lower, stop=stop, layout=layout)
+            if prof is not None:
+                prof.exact_time = time.perf_counter() - t
+            if found is not None:
+                best_sheets = found
+            # το maxrects βάζει και μη guillotine πακεταρίσματα (π.χ. pinwheel)
+            proven = (proven_guillotine if layout is GuillotineLayout
+                      else len(best_sheets) <= lower)
+        if stats is not None:
+            if prof is not None:
+                d = prof.as_dict()
+                if "profile" in counters:
+                    d = _Profile.merge(counters.pop("profile"), d)
+                stats["profile"] = d
+            stats.update(counters)
+            stats["lower_bound"] = lower
+            stats["proven_optimal"] = proven
+            stats["proven_optimal_guillotine"] = proven_guillotine
+            stats["offcuts_used"] = len(offcut_sheets)
+    return offcut_sheets + (best_sheets or [])
+
+def _optimize_parallel(base: List[Piece], W: int, H: int, K: int,
+                       strategy: str, allow_rotation: bool,
+                       attempts: int, workers: int, seed: int,
+                       stats: Optional[dict] = None,
+                       mode: str = "maxrects", lower: int = 0,
+                       profile: bool = False) -> List[SheetLayout]:
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(workers, attempts)
+    compact_pieces = [(p.w, p.h, p.name) for p in base]
+    batches = [list(range(a, attempts, workers)) for a in range(workers)]
+    jobs = [(compact_pieces, W, H, K, strategy, allow_rotation, seed, ids, mode,
+             lower, profile) for ids in batches]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        results = list(ex.map(_attempt_batch_worker, jobs))
+    # ίδιος κανόνας με τη σειριακή: σε ισοβαθμία κερδίζει το πρώτο attempt
+    _, _, best, _ = min(results, key=lambda r: (r[0], r[1]))
+    if stats is not None:
+        # κάθε worker έχει δικό του cache (και profile)
+        for r in results:
+            for k, v in r[3].items():
+                if k == "profile":
+                    stats[k] = _Profile.merge(stats.get(k, {}), v)
+                else:
+                    stats[k] = stats.get(k, 0) + v
+    layout = _layout_for(mode)
+    return [_sheet_from_compact(d, layout) for d in best]
+
+
+# --- anytime -------------------------------------------------------------
+
+def optimize_cut_anytime(W: int, H: int, K: int,
+                         piece_list: List[Tuple[int,int,int]],
+                         strategy: str, allow_rotation: bool,
+                         time_budget: float,
+                         target_sheets: Optional[int] = None,
+                         max_scrap: Optional[int] = None,
+                         seed: Optional[int] = None,
+                         max_attempts: Optional[int] = None,
+                         mode: str = "maxrects"
+                         ) -> Iterator[Tuple[List[SheetLayout], Tuple[int, int]]]:
+    # Κάνει attempts όπως το optimize_cut_multi_start (ίδια seeds ανά attempt)
+    # μέχρι να τελειώσει το time_budget (δευτερόλεπτα) και κάνει yield
+    # (sheets, score) κάθε φορά που βρίσκει καλύτερο _score_sheets.
+    # Σταματά νωρίτερα όταν φτάσει το _sheet_lower_bound, που είναι
+    # αποδεδειγμένα βέλτιστο, ή όταν πιάσει τους target_sheets / max_scrap
+    # που δόθηκαν.
+    layout = _layout_for(mode)
     base = _flatten_piece_list(piece_list)
-    best_sheets = None
-    best_score = None
-    for _ in range(attempts):
-        pieces = deepcopy(base)
-        pieces.sort(key=lambda p: p.w*p.h, reverse=True)
-        i = 0
-        while i < len(pieces):
-            j = i+1
-            area0 = pieces[i].w * pieces[i].h
-            while j < len(pieces) and abs(pieces[j].w*pieces[j].h - area0) <= max(1, area0//50):
-                j += 1
-            chunk = pieces[i:j]
-            random.shuffle(chunk)
-            pieces[i:j] = chunk
-            i = j
-        sheets = _pack_once(pieces, W, H, K, strategy, allow_rotation)
-        _global_compactor(sheets, strategy, allow_rotation)
-        _global_refine_heavy(sheets, strategy, allow_rotation, W, H, K, rounds=3)
+    if not base:
+        return
+    if seed is None:
+        seed = random.getrandbits(32)
+    deadline = time.monotonic() + time_budget
+    out_of_time = lambda: time.monotonic() >= deadline
+    lower = _sheet_lower_bound(base, W, H, allow_rotation)
+    cache = _PackCache()
+
+    best = None
+    a = 0
+    while True:
+        sheets = _run_attempt(base, W, H, K, strategy, allow_rotation,
+                              _attempt_rng(seed, a), stop=out_of_time, cache=cache,
+                              layout=layout)
+        a += 1
         sc = _score_sheets(sheets)
-        if best_score is None or sc < best_score:
-            best_score = sc
-            best_sheets = deepcopy(sheets)
-    return best_sheets or []
+        if best is None or sc < best:
+            best = sc
+            yield sheets, sc
+        if best[0] <= lower:
+            return
+        if ((target_sheets is not None or max_scrap is not None)
+                and (target_sheets is None or best[0] <= target_sheets)
+                and (max_scrap is None or best[1] <= max_scrap)):
+            return
+        if out_of_time() or (max_attempts is not None and a >= max_attempts):
+            return
+
+
+# --- αναζήτηση -----------------------------------------------------------
+# Simulated annealing πάνω στη σειρά και τον προσανατολισμό των ομάδων ίδιων
+# τεμαχίων (_identical_runs), αντί για attempts που δεν μαθαίνουν τίποτα το
+# ένα από το άλλο. Μια κίνηση που αλλάζει τη σειρά από τη θέση k και μετά
+# αφήνει ίδιο το first-fit των k πρώτων ομάδων: κρατιούνται snapshots των
+# φύλλων κάθε `step` ομάδες και η αποτίμηση ξεκινά από το τελευταίο πριν από το k.
+
+# Χρόνος (δευτερόλεπτα) του optimize_cut_search αν δεν δοθεί άλλος.
+SEARCH_TIME = 5.0
+# Τι μέρος του χρόνου παίρνει το annealing, το υπόλοιπο μένει για
+# compactor/refine της καλύτερης σειράς.
+SEARCH_ANNEAL_SHARE = 0.85
+
+# προσανατολισμός μιας ομάδας: ελεύθερος (κατά το allow_rotation), όπως
+# δόθηκε ή γυρισμένη
+_ORIENT_FREE, _ORIENT_ASIS, _ORIENT_TURNED = 0, 1, 2
+
+
+def _run_orients(p: Piece, W: int, H: int, rot: bool) -> List[int]:
+    if not rot or p.w == p.h:
+        return [_ORIENT_FREE]
+    out = [_ORIENT_FREE]
+    if p.w <= W and p.h <= H:
+        out.append(_ORIENT_ASIS)
+    if p.h <= W and p.w <= H:
+        out.append(_ORIENT_TURNED)
+    return out
+
+
+class _PrefixPacker:
+    # first-fit μιας σειράς γονιδίων (ομάδα, προσανατολισμός). Τα
+    # checkpoints της σειράς είναι λίστα: cps[j] = φύλλα μετά τις j * step
+    # πρώτες ομάδες (cps[0] = []). Τα snapshots δεν αλλάζουν ποτέ, κάθε
+    # αποτίμηση δουλεύει σε αντίγραφα.
+    def __init__(self, runs: List[List[Piece]], W: int, H: int, K: int,
+                 strat: str, rot: bool, layout=SheetLayout, step: int = 8):
+        self.runs = runs
+        # η γυρισμένη ομάδα είναι κλώνοι με ανάποδες διαστάσεις και χωρίς
+        # rotation, το restore τους ξαναγυρνάει στα αρχικά Piece
+        self.turned = [[Piece(p.h, p.w, p.name) for p in run] for run in runs]
+        self.W, self.H, self.K = W, H, K
+        self.strat, self.rot = strat, rot
+        self.layout = layout
+        self.step = max(1, step)
+        self.evals = 0
+        self.runs_placed = 0
+
+    def evaluate(self, genes, k: int, cps):
+        step = self.step
+        j = min(k // step, len(cps) - 1)
+        sheets = [sh.copy() for sh in cps[j]]
+        cps = cps[:j + 1]
+        for idx in range(j * step, len(genes)):
+            if idx > j * step and idx % step == 0:
+                cps.append([sh.copy() for sh in sheets])
+            r, o = genes[idx]
+            self._place(sheets, self.turned[r] if o == _ORIENT_TURNED else self.runs[r],
+                        self.rot and o == _ORIENT_FREE)
+        self.evals += 1
+        self.runs_placed += len(genes) - j * step
+        return sheets, cps
+
+    def _place(self, sheets, run, rot):
+        for sh in sheets:
+            sh.allow_rotation = rot
+        i = 0
+        while i < len(run):
+            rest = run[i:]
+            n = 0
+            for sh in sheets:
+                n = sh.place_run(rest)
+                if n:
+                    break
+            if not n:
+                sh = self.layout(self.W, self.H, self.K, self.strat, rot)
+                n = sh.place_run(rest)
+                if not n:
+                    raise ValueError(f"Το κομμάτι {rest[0]} δεν χωράει στο φύλλο {self.W}x{self.H}!")
+                sheets.append(sh)
+            i += n
+
+    def restore(self, sheets):
+        # τελικά φύλλα: αρχικά Piece αντί για κλώνους, allow_rotation του optimize
+        orig = {id(c): p for run, turned in zip(self.runs, self.turned)
+                for p, c in zip(run, turned)}
+        for sh in sheets:
+            sh.allow_rotation = self.rot
+            if any(id(pp.piece) in orig for pp in sh.placed):
+                sh._swap_placed([PlacedPiece(orig[id(pp.piece)], pp.x, pp.y, not pp.rotated)
+                                 if id(pp.piece) in orig else pp for pp in sh.placed])
+
+
+def _search_energy(sheets, area: int) -> float:
+    # πλήθος φύλλων, και ανάμεσα σε λύσεις με ίδιο πλήθος καλύτερη αυτή με
+    # πιο άνισο γέμισμα: ένα σχεδόν άδειο φύλλο είναι πιο κοντά στο να φύγει
+    n = len(sheets)
+    fill = sum((sh.get_used_area() / area) ** 2 for sh in sheets)
+    return n - fill / n
+
+
+# Κινήσεις της αναζήτησης: (genes, rng, orients) -> (νέα genes, k) ή None αν
+# δεν εφαρμόζεται. k είναι η πρώτη θέση που άλλαξε, orients[r] οι
+# επιτρεπτοί προσανατολισμοί της ομάδας r.
+
+def _move_swap(genes, rng, orients):
+    if len(genes) < 2:
+        return None
+    i, j = sorted(rng.sample(range(len(genes)), 2))
+    g = list(genes)
+    g[i], g[j] = g[j], g[i]
+    return g, i
+
+def _move_insert(genes, rng, orients):
+    if len(genes) < 2:
+        return None
+    i, j = rng.sample(range(len(genes)), 2)
+    g = list(genes)
+    g.insert(j, g.pop(i))
+    return g, min(i, j)
+
+def _move_orient(genes, rng, orients):
+    i = rng.randrange(len(genes))
+    r, o = genes[i]
+    choices = [x for x in orients[r] if x != o]
+    if not choices:
+        return None
+    g = list(genes)
+    g[i] = (r, rng.choice(choices))
+    return g, i
+
+SEARCH_MOVES = {"swap": _move_swap, "insert": _move_insert, "orient": _move_orient}
+
+
+def _polish(sheets, strategy, allow_rotation, W, H, K, rng, stop):
+    # ό,τι κάνει το _run_attempt μετά το pack
+    _global_compactor(sheets, strategy, allow_rotation, stop=stop)
+    _global_refine_heavy(sheets, strategy, allow_rotation, W, H, K, rounds=3,
+                         rng=rng, stop=stop)
+    return sheets
+
+def optimize_cut_search(W: int, H: int, K: int,
+                        piece_list: List[Tuple[int,int,int]],
+                        strategy: str, allow_rotation: bool,
+                        time_budget: float = SEARCH_TIME,
+                        seed: Optional[int] = None,
+                        moves: Optional[list] = None,
+                        stop: Optional[Callable[[], bool]] = None,
+                        stats: Optional[dict] = None,
+                        mode: str = "maxrects") -> List[SheetLayout]:
+    # Ξεκινά από το attempt 0 του optimize_cut_multi_start (ίδιο seed, ίδια
+    # φύλλα) και ψάχνει για time_budget δευτερόλεπτα (ή ως το stop() / το
+    # _sheet_lower_bound). moves: ονόματα του SEARCH_MOVES ή συναρτήσεις με
+    # την ίδια υπογραφή, διαλέγεται μία στην τύχη σε κάθε βήμα (default όλες).
+    # Η καλύτερη σειρά περνά από compactor/refine όπως ένα attempt και
+    # επιστρέφεται μόνο αν είναι καλύτερη από το attempt 0.
+    # stats: evals, accepted, improved, runs_placed / runs_total (πόσες
+    # ομάδες τοποθετήθηκαν πραγματικά, έναντι ολόκληρου repack σε κάθε eval)
+    # και lower_bound.
+    layout = _layout_for(mode)
+    base = _flatten_piece_list(piece_list)
+    if not base:
+        return []
+    if seed is None:
+        seed = random.getrandbits(32)
+    moves = [SEARCH_MOVES[m] if isinstance(m, str) else m
+             for m in (moves or list(SEARCH_MOVES))]
+    t0 = time.monotonic()
+    deadline = t0 + time_budget
+    anneal_end = t0 + time_budget * SEARCH_ANNEAL_SHARE
+    out_of_time = lambda: time.monotonic() >= deadline or (stop is not None and stop())
+    lower = _sheet_lower_bound(base, W, H, allow_rotation)
+    area = W * H
+
+    rng = _attempt_rng(seed, 0)
+    pieces = list(base)
+    _shuffle_area_bands(pieces, rng)
+    runs = _identical_runs(pieces)
+    orients = [_run_orients(run[0], W, H, allow_rotation) for run in runs]
+    packer = _PrefixPacker(runs, W, H, K, strategy, allow_rotation, layout,
+                           step=max(1, int(math.sqrt(len(runs)))))
+
+    genes = start_genes = [(r, _ORIENT_FREE) for r in range(len(runs))]
+    sheets, cps = packer.evaluate(genes, 0, [[]])
+    energy = best_energy = _search_energy(sheets, area)
+    best_genes = genes
+    # το attempt 0 όπως στο multi-start, με δικό του rng: η αναζήτηση δεν
+    # επιστρέφει χειρότερο (εκτός αν το stop κόψει το ίδιο το attempt)
+    start = _run_attempt(base, W, H, K, strategy, allow_rotation, _attempt_rng(seed, 0),
+                         stop=out_of_time, layout=layout)
+    accepted = improved = 0
+
+    if len(start) > lower:
+        # θερμοκρασία: μια μέση χειροτέρευση γίνεται δεκτή με πιθανότητα ~1/3
+        # στην αρχή και ~0 στο τέλος, με γεωμετρική ψύξη ως προς τον χρόνο
+        ups = []
+        for _ in range(20):
+            if out_of_time():
+                break
+            mv = rng.choice(moves)(genes, rng, orients)
+            if mv is None:
+                continue
+            s, _ = packer.evaluate(mv[0], mv[1], cps)
+            d = _search_energy(s, area) - energy
+            if d > 0:
+                ups.append(d)
+        t_start = (sum(ups) / len(ups) if ups else 0.1) / math.log(3)
+        t_end = t_start * 1e-3
+        while not out_of_time():
+            now = time.monotonic()
+            if now >= anneal_end:
+                break
+            temp = t_start * (t_end / t_start) ** ((now - t0) / (anneal_end - t0))
+            mv = rng.choice(moves)(genes, rng, orients)
+            if mv is None:
+                continue
+            new_genes, k = mv
+            new_sheets, new_cps = packer.evaluate(new_genes, k, cps)
+            e = _search_energy(new_sheets, area)
+            if e <= energy or rng.random() < math.exp((energy - e) / temp):
+                genes, cps, energy = new_genes, new_cps, e
+                accepted += 1
+                if e < best_energy:
+                    best_genes, best_energy = genes, e
+                    improved += 1
+                    if len(new_sheets) <= lower:
+                        break
+
+    result = start
+    if best_genes is not start_genes:
+        sheets, _ = packer.evaluate(best_genes, 0, [[]])
+        packer.restore(sheets)
+        _polish(sheets, strategy, allow_rotation, W, H, K, _attempt_rng(seed, 1),
+                out_of_time)
+        if _score_sheets(sheets) < _score_sheets(result):
+            result = sheets
+    if stats is not None:
+        stats["evals"] = packer.evals
+        stats["accepted"] = accepted
+        stats["improved"] = improved
+        stats["runs_placed"] = packer.runs_placed
+        stats["runs_total"] = packer.evals * len(runs)
+        stats["lower_bound"] = lower
+    return result
+
+
+# --- incremental ---------------------------------------------------------
+# Νέα τεμάχια σε πλάνο που υπάρχει ήδη: τα τεμάχια του πλάνου δεν
+# μετακινούνται (εκτός από το προαιρετικό τοπικό refine), τα νέα μπαίνουν
+# στον ελεύθερο χώρο με first-fit και νέο φύλλο ανοίγει μόνο όταν χρειαστεί.
+
+def optimize_cut_incremental(sheets: List[SheetLayout],
+                             piece_list: List[Tuple[int,int,int]],
+                             strategy: Optional[str] = None,
+                             allow_rotation: Optional[bool] = None,
+                             refine: bool = False,
+                             refine_rounds: int = 2,
+                             seed: Optional[int] = None,
+                             stats: Optional[dict] = None,
+                             stop: Optional[Callable[[], bool]] = None,
+                             stocks: Optional[List["Stock"]] = None,
+                             W: Optional[int] = None,
+                             H: Optional[int] = None) -> List[SheetLayout]:
+    # Επιστρέφει νέα λίστα φύλλων (copy() των υπαρχόντων, τα sheets δεν
+    # αλλάζουν). Τα νέα τεμάχια παίρνουν ονόματα μετά τα υπάρχοντα, όπως αν
+    # είχαν μπει στο τέλος του piece_list της αρχικής δουλειάς.
+    # refine=True: _global_refine_heavy μόνο στα φύλλα που άλλαξαν, για να
+    # κλείσει όσα νέα φύλλα γίνεται. Εκεί μπορούν να μετακινηθούν και
+    # τεμάχια του πλάνου. Το stop() κόβει μόνο το refine, η λύση είναι
+    # πάντα πλήρης.
+    # Πλάνο του optimize_cut_materials (φύλλα με sh.stock): ένα υλικό μόνο,
+    # αφού τα νέα τεμάχια δεν έχουν υλικό. Νέα φύλλα ανοίγουν όπως στο
+    # _optimize_stock από τα stocks (default: όσα έχει ήδη το πλάνο), το
+    # refine γίνεται ανά μέγεθος φύλλου και τα φύλλα που ξαναφτιάχτηκαν
+    # περνούν από _downsize.
+    # W, H: μέγεθος νέων φύλλων χωρίς stocks, αλλιώς αυτό του πρώτου
+    # κανονικού φύλλου. Πλάνο μόνο με ρετάλια θέλει W/H ή stocks.
+    if not sheets:
+        raise ValueError("Δεν υπάρχει πλάνο για να προστεθούν τεμάχια.")
+    # διαστάσεις νέων φύλλων από κανονικό φύλλο, ποτέ από ρετάλι
+    first = next((sh for sh in sheets if sh.offcut is None), None)
+    if stocks is None:
+        stocks = list({sh.stock.to_compact(): sh.stock for sh in sheets
+                       if sh.stock is not None}.values())
+    if first is not None:
+        W = first.sheet_w if W is None else W
+        H = first.sheet_h if H is None else H
+    elif not stocks and (W is None or H is None):
+        raise ValueError("Το πλάνο έχει μόνο ρετάλια: δώσε W/H ή stocks "
+                         "για τα νέα φύλλα.")
+    src = first if first is not None else sheets[0]
+    K = src.kerf
+    strat = src.strategy if strategy is None else strategy
+    rot = src.allow_rotation if allow_rotation is None else allow_rotation
+    layout = type(src)
+    if len({(st.material, st.thickness) for st in stocks}) > 1:
+        raise ValueError("Το πλάνο έχει πολλά υλικά: τα νέα τεμάχια θέλουν "
+                         "optimize_cut_materials με υλικό.")
+    by_unit = sorted(stocks, key=lambda st: (st.cost / (st.w * st.h), -st.w * st.h))
+
+    def open_sheet(p: Piece):
+        if not by_unit:
+            return layout(W, H, K, strat, rot)
+        st = next((st for st in by_unit if st.fits(p, rot)), None)
+        if st is None:
+            return None
+        sh = layout(st.w, st.h, K, strat, rot)
+        sh.stock = st
+        return sh
+
+    out = [sh.copy() for sh in sheets]
+    n_old = len(out)
+    old = {id(sh) for sh in out}
+    start = 1 + sum(len(sh.placed) for sh in out)
+    pieces = _flatten_piece_list(piece_list, start)
+    pieces.sort(key=lambda p: p.w * p.h, reverse=True)
+    touched, rest = _fill_sheets(out, pieces, strat, rot, open_sheet)
+    if rest:
+        where = "σε κανένα φύλλο" if by_unit else f"στο φύλλο {W}x{H}"
+        raise ValueError(f"Το κομμάτι {rest[0]} δεν χωράει {where}!")
+    opened = len(out) - n_old
+
+    # τα ρετάλια έχουν άλλες διαστάσεις, το refine δουλεύει ανά μέγεθος
+    # φύλλου (και stock) και μόνο όπου άνοιξαν νέα φύλλα
+    touched = {i for i in touched if out[i].offcut is None}
+    groups = {}
+    for i in sorted(touched):
+        sh = out[i]
+        key = (sh.sheet_w, sh.sheet_h, sh.stock.to_compact() if sh.stock else None)
+        groups.setdefault(key, []).append(i)
+    drop = set()
+    if refine and opened:
+        if seed is None:
+            seed = random.getrandbits(32)
+        rng = random.Random(seed)
+        for (gw, gh, _), idxs in groups.items():
+            if len(idxs) < 2 or all(i < n_old for i in idxs):
+                continue
+            stock = out[idxs[0]].stock
+            group = [out[i] for i in idxs]
+            _global_refine_heavy(group, strat, rot, gw, gh, K, rounds=refine_rounds,
+                                 rng=rng, stop=stop)
+            # τα φύλλα που έμειναν πάνε στις θέσεις τους με τη σειρά, ώστε να
+            # φεύγουν πρώτα τα νέα φύλλα στο τέλος
+            for i, sh in zip(idxs, group):
+                sh.stock = stock
+                out[i] = sh
+            drop.update(idxs[len(group):])
+    out = [sh for i, sh in enumerate(out) if i not in drop]
+    closed = len(drop)
+    if by_unit:
+        fresh = [i for i, sh in enumerate(out) if id(sh) not in old and sh.stock is not None]
+        resized = [out[i] for i in fresh]
+        _downsize(resized, stocks, K, strat, rot, layout)
+        for i, sh in zip(fresh, resized):
+            out[i] = sh
+    if stats is not None:
+        stats["placed"] = len(pieces)
+        stats["sheets_touched"] = len(touched)
+        stats["sheets_opened"] = opened - closed
+    return out
+
+
+def layouts_to_json(sheets: List[SheetLayout]) -> dict:
+    # πλάνο σε μορφή για json (π.χ. μέσα στο job.json του app)
+    mode = "guillotine" if sheets and isinstance(sheets[0], GuillotineLayout) else "maxrects"
+    return {"mode": mode, "sheets": [_sheet_to_compact(sh) for sh in sheets]}
+
+
+def layouts_from_json(data: dict) -> List[SheetLayout]:
+    layout = _layout_for(data.get("mode", "maxrects"))
+    return [_sheet_from_compact(d, layout) for d in data.get("sheets", [])]
+
+
+# --- υλικά / μεγέθη φύλλων -----------------------------------------------
+# Παραγγελία με τεμάχια διαφορετικών υλικών και φύλλα (stock) σε διάφορα
+# μεγέθη με κόστος. Κάθε υλικό είναι ανεξάρτητο πρόβλημα και τρέχει σε
+# δικό του process όταν workers > 1.
+
+class Stock:
+    __slots__ = ("w", "h", "cost", "material", "thickness")
+
+    def __init__(self, w: int, h: int, cost: float = 1.0, material: str = "",
+                 thickness: float = 0):
+        self.w = w
+        self.h = h
+        self.cost = cost
+        self.material = material
+        self.thickness = thickness
+
+    def fits(self, p: Piece, rot: bool) -> bool:
+        return any(pw <= self.w and ph <= self.h for pw, ph in _orientations(p.w, p.h, rot))
+
+    def to_compact(self):
+        return (self.w, self.h, self.cost, self.material, self.thickness)
+
+    @classmethod
+    def from_compact(cls, data) -> "Stock":
+        return cls(*data)
+
+    def __repr__(self):
+        return f"Stock({self.w}x{self.h} {self.material} {self.cost})"
+
+
+def _downsize(sheets: List[SheetLayout], stocks: List[Stock], K: int, strat: str,
+              rot: bool, layout=SheetLayout):
+    # Κάθε φύλλο (συνήθως τα τελευταία, που είναι μισοάδεια) περνάει στο
+    # φθηνότερο stock που χωράει τα τεμάχιά του σε ένα φύλλο.
+    by_cost = sorted(stocks, key=lambda st: (st.cost, st.w * st.h))
+    for i, sh in enumerate(sheets):
+        pieces = sorted((pp.piece for pp in sh.placed), key=lambda p: p.w * p.h,
+                        reverse=True)
+        used = sh.get_used_area()
+        for st in by_cost:
+            if st.cost >= sh.stock.cost:
+                break
+            if st.w * st.h < used or not all(st.fits(p, rot) for p in pieces):
+                continue
+            got = _first_fit(pieces, st.w, st.h, K, strat, rot, max_sheets=1,
+                             layout=layout)
+            if got:
+                got[0].stock = st
+                sheets[i] = got[0]
+                break
+
+
+def _optimize_stock(base: List[Piece], stocks: List[Stock], K: int, strategy: str,
+                    allow_rotation: bool, attempts: int, seed: int, mode: str,
+                    exact: bool, offcuts: Optional[List[Offcut]],
+                    stats: Optional[dict] = None,
+                    progress: Optional[Callable[[int, int, Tuple[int, int]], None]] = None,
+                    stop: Optional[Callable[[], bool]] = None) -> List[SheetLayout]:
+    # Ένα υλικό. Για κάθε stock ως κύριο φύλλο: multi-start για όσα τεμάχια
+    # χωράνε σε αυτό, τα υπόλοιπα στο stock με το μικρότερο κόστος ανά
+    # εμβαδόν που τα χωράει, και μετά _downsize. Κρατιέται το φθηνότερο.
+    # Με stop() δεν δοκιμάζονται άλλα κύρια stocks.
+    layout = _layout_for(mode)
+    for p in base:
+        if not any(st.fits(p, allow_rotation) for st in stocks):
+            raise ValueError(f"Το κομμάτι {p} δεν χωράει σε κανένα φύλλο!")
+    offcut_sheets = []
+    if offcuts:
+        offcut_sheets, base = _fill_offcuts(base, offcuts, K, strategy,
+                                            allow_rotation, layout)
+    by_unit = sorted(stocks, key=lambda st: (st.cost / (st.w * st.h), -st.w * st.h))
+    best = None
+    best_key = None
+    for primary in by_unit:
+        if best is not None and stop is not None and stop():
+            break
+        if base and not any(primary.fits(p, allow_rotation) for p in base):
+            continue
+        groups = {}
+        for p in base:
+            st = primary if primary.fits(p, allow_rotation) else next(
+                s for s in by_unit if s.fits(p, allow_rotation))
+            groups.setdefault(st, []).append(p)
+        sheets = []
+        for st, pieces in groups.items():
+            for sh in _optimize_pieces(pieces, st.w, st.h, K, strategy, allow_rotation,
+                                       attempts, seed=seed, progress=progress,
+                                       stop=stop, mode=mode, exact=exact):
+                sh.stock = st
+                sheets.append(sh)
+        _downsize(sheets, stocks, K, strategy, allow_rotation, layout)
+        key = (sum(sh.stock.cost for sh in sheets),) + _score_sheets(sheets)
+        if best_key is None or key < best_key:
+            best, best_key = sheets, key
+        if not base:
+            break
+    if stats is not None:
+        stats["cost"] = best_key[0]
+        stats["sheets"] = len(best)
+        stats["offcuts_used"] = len(offcut_sheets)
+        stats["stock"] = {}
+        for sh in best:
+            name = f"{sh.stock.w}x{sh.stock.h}"
+            stats["stock"][name] = stats["stock"].get(name, 0) + 1
+    return offcut_sheets + best
+
+
+def _material_worker(job):
+    # process του pool: ένα υλικό, αποτέλεσμα σε compact μορφή
+    (material, compact_pieces, stocks, K, strategy, allow_rotation, attempts, seed,
+     mode, exact, offcuts) = job
+    base = [Piece(w, h, name) for (w, h, name) in compact_pieces]
+    stats = {}
+    sheets = _optimize_stock(base, [Stock.from_compact(d) for d in stocks], K,
+                             strategy, allow_rotation, attempts, seed, mode, exact,
+                             [Offcut.from_compact(d) for d in offcuts], stats)
+    return material, [_sheet_to_compact(sh) for sh in sheets], stats
+
+
+def optimize_cut_materials(K: int, parts: List[tuple], stocks: List[Stock],
+                           strategy: str, allow_rotation: bool,
+                           attempts: int = 50,
+                           workers: int = 1,
+                           seed: Optional[int] = None,
+                           stats: Optional[dict] = None,
+                           mode: str = "maxrects",
+                           exact: bool = True,
+                           inventory: Optional[OffcutInventory] = None,
+                           progress: Optional[Callable[[int, int, Tuple[int, int]], None]] = None,
+                           stop: Optional[Callable[[], bool]] = None
+                           ) -> "OrderedDict[str, List[SheetLayout]]":
+    # parts: [(w, h, q, υλικό), ...] (χωρίς υλικό = ""), stocks: τα φύλλα
+    # που υπάρχουν ανά υλικό. Επιστρέφει υλικό -> φύλλα, με τη σειρά που
+    # εμφανίζονται τα υλικά στο parts, και κάθε φύλλο έχει sh.stock (ή
+    # sh.offcut αν είναι ρετάλι από το inventory). Τα ονόματα P1..Pn είναι
+    # όπως στο _flatten_piece_list όλου του parts.
+    # stats: ανά υλικό cost / sheets / offcuts_used / stock (πλήθος ανά
+    # μέγεθος) στο stats["materials"] και το συνολικό κόστος στο stats["cost"].
+    # progress / stop όπως στο optimize_cut_multi_start, για κάθε multi-start
+    # (υλικό και stock) χωριστά και μόνο στη σειριακή εκτέλεση. Με stop()
+    # κάθε υλικό που μένει παίρνει ένα attempt, ώστε η λύση να είναι πλήρης.
+    groups = OrderedDict()
+    c = 1
+    for part in parts:
+        w, h, q = part[:3]
+        material = part[3] if len(part) > 3 else ""
+        pieces = groups.setdefault(material, [])
+        for _ in range(q):
+            pieces.append(Piece(w, h, name=f"P{c}"))
+            c += 1
+    for material in groups:
+        if not any(st.material == material for st in stocks):
+            raise ValueError(f"Δεν υπάρχει φύλλο για το υλικό '{material}'")
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    jobs = []
+    for material, pieces in groups.items():
+        mstocks = [st for st in stocks if st.material == material]
+        offcuts = []
+        if inventory is not None:
+            # ένα υλικό μπορεί να έχει stock σε πολλά πάχη, ρετάλια από όλα
+            for th in sorted({st.thickness for st in mstocks}):
+                offcuts.extend(inventory.matching(material, th))
+        jobs.append((material, pieces, mstocks, offcuts))
+
+    out = OrderedDict()
+    per = OrderedDict()
+    if workers > 1 and len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        layout = _layout_for(mode)
+        compact = [(material, [(p.w, p.h, p.name) for p in pieces],
+                    [st.to_compact() for st in mstocks], K, strategy, allow_rotation,
+                    attempts, seed, mode, exact, [oc.to_compact() for oc in offcuts])
+                   for material, pieces, mstocks, offcuts in jobs]
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as ex:
+            for material, sheets, st in ex.map(_material_worker, compact):
+                out[material] = [_sheet_from_compact(d, layout) for d in sheets]
+                per[material] = st
+    else:
+        for material, pieces, mstocks, offcuts in jobs:
+            st = {}
+            out[material] = _optimize_stock(pieces, mstocks, K, strategy, allow_rotation,
+                                            attempts, seed, mode, exact, offcuts, st,
+                                            progress, stop)
+            per[material] = st
+    if stats is not None:
+        stats["materials"] = per
+        stats["cost"] = sum(st["cost"] for st in per.values())
+    return out
+
@@ -0,0 +1,168 @@
+# render.py
+# PNG των φύλλων με Pillow: τεμάχια με ετικέτες, kerf και ρετάλια.
+# Τα ίδια τεμάχια (ίδιο μέγεθος σε pixels, ίδια ετικέτα) ζωγραφίζονται μία
+# φορά και μετά γίνονται paste. Η εξαγωγή τρέχει σε threads (το Pillow
+# αφήνει το GIL στο encoding) και κάθε thread κρατάει μία εικόνα τη φορά.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+# μεγαλύτερη πλευρά σε pixels: εξαγωγή και preview για την οθόνη
+EXPORT_PX = 2000
+PREVIEW_PX = 480
+# τεμάχια ως τόσα pixels μπαίνουν στην cache, τα μεγαλύτερα ζωγραφίζονται κατευθείαν
+TILE_CACHE_PX = 256 * 256
+
+SHEET_BG = (236, 226, 204)
+KERF = (70, 70, 70)
+OUTLINE = (40, 40, 40)
+OFFCUT_BG = (206, 232, 198)
+OFFCUT_LINE = (60, 150, 60)
+TEXT = (20, 20, 20)
+PALETTE = [(166, 206, 227), (178, 223, 138), (251, 154, 153), (253, 191, 111),
+           (202, 178, 214), (255, 255, 153), (141, 211, 199), (190, 186, 218)]
+
+
+_fonts = threading.local()
+
+
+def _font(size: int):
+    # ένα font ανά thread, το FreeType face δεν είναι για κοινή χρήση
+    cache = _fonts.__dict__.setdefault("by_size", {})
+    font = cache.get(size)
+    if font is None:
+        try:
+            font = ImageFont.load_default(size)
+        except TypeError:  # Pillow < 10.1: μόνο το bitmap font
+            font = ImageFont.load_default()
+        cache[size] = font
+    return font
+
+
+def _text_size(text: str, size: int):
+    x0, y0, x1, y1 = _font(size).getbbox(text)
+    return x1 - x0, y1
+
+
+def _draw_box(draw, x0, y0, w, h, fill, line, label, size):
+    draw.rectangle((x0, y0, x0 + w - 1, y0 + h - 1), fill=fill, outline=line)
+    if label:
+        tw, th = _text_size(label, size)
+        if tw + 4 <= w and th + 4 <= h:
+            draw.text((x0 + (w - tw) // 2, y0 + (h - th) // 2), label, fill=TEXT,
+                      font=_font(size))
+
+
+@lru_cache(maxsize=512)
+def _part_tile(w: int, h: int, label: str, fill, size: int) -> Image.Image:
+    tile = Image.new("RGB", (w, h), fill)
+    _draw_box(ImageDraw.Draw(tile), 0, 0, w, h, fill, OUTLINE, label, size)
+    return tile
+
+
+def _color(pw: int, ph: int):
+    # ίδιο είδος τεμαχίου -> ίδιο χρώμα, και με περιστροφή
+    return PALETTE[hash((min(pw, ph), max(pw, ph))) % len(PALETTE)]
+
+
+def render_sheet(sh, max_px: int = EXPORT_PX, names: bool = True,
+                 offcuts: bool = True) -> Image.Image:
+    # Εικόνα του φύλλου με τη μεγάλη πλευρά max_px. names=False για
+    # previews, όπου οι ετικέτες δεν διαβάζονται έτσι κι αλλιώς.
+    W, H = sh.sheet_w, sh.sheet_h
+    s = max_px / max(W, H)
+    px = lambda v: int(round(v * s))
+    img = Image.new("RGB", (max(1, px(W)), max(1, px(H))), SHEET_BG)
+    draw = ImageDraw.Draw(img)
+    size = max(10, max_px // 80)
+
+    if offcuts:
+        for fr in sh.leftovers():
+            x0, y0 = px(fr.x), px(fr.y)
+            _draw_box(draw, x0, y0, max(1, px(fr.x + fr.w) - x0),
+                      max(1, px(fr.y + fr.h) - y0), OFFCUT_BG, OFFCUT_LINE,
+                      f"{fr.w}x{fr.h}" if names else "", size)
+
+    # kerf: στο guillotine οι κοπές του δέντρου, αλλιώς η λωρίδα δεξιά και
+    # κάτω από κάθε τεμάχιο (εκεί που το αφήνει το maxrects)
+    k = max(1, px(sh.kerf)) if sh.kerf else 0
+    if k:
+        if hasattr(sh, "cuts"):
+            for c in sh.cuts():
+                if c.vertical:
+                    box = (px(c.pos), px(c.start), px(c.pos) + k - 1, px(c.start + c.length) - 1)
+                else:
+                    box = (px(c.start), px(c.pos), px(c.start + c.length) - 1, px(c.pos) + k - 1)
+                draw.rectangle(box, fill=KERF)
+        else:
+            for pp in sh.placed:
+                x1, y1 = pp.x + pp.w, pp.y + pp.h
+                if x1 < W:
+                    draw.rectangle((px(x1), px(pp.y), px(x1) + k - 1, px(y1) - 1), fill=KERF)
+                if y1 < H:
+                    draw.rectangle((px(pp.x), px(y1), px(x1) - 1, px(y1) + k - 1), fill=KERF)
+
+    for pp in sh.placed:
+        x0, y0 = px(pp.x), px(pp.y)
+        w = max(1, px(pp.x + pp.w) - x0)
+        h = max(1, px(pp.y + pp.h) - y0)
+        label = f"{pp.piece.w}x{pp.piece.h}" if names else ""
+        fill = _color(pp.piece.w, pp.piece.h)
+        if w * h <= TILE_CACHE_PX:
+            img.paste(_part_tile(w, h, label, fill, size), (x0, y0))
+        else:
+            _draw_box(draw, x0, y0, w, h, fill, OUTLINE, label, size)
+        if names and pp.piece.name:
+            tw, th = _text_size(pp.piece.name, size)
+            if tw + 6 <= w and 2 * th + 8 <= h:
+                draw.text((x0 + 3, y0 + 3), pp.piece.name, fill=TEXT, font=_font(size))
+    return img
+
+
+def save_png(sh, path: str, max_px: int = EXPORT_PX, names: bool = True) -> str:
+    img = render_sheet(sh, max_px, names)
+    # τα previews θέλουν ταχύτητα, όχι μικρό αρχείο
+    img.save(path, "PNG", compress_level=1 if max_px <= PREVIEW_PX else 6)
+    return path
+
+
+def export_sheets(sheets, out_dir: str, max_px: Optional[int] = EXPORT_PX,
+                  preview_px: Optional[int] = PREVIEW_PX, prefix: str = "sheet",
+                  workers: int = 2,
+                  on_preview: Optional[Callable[[int, str], None]] = None,
+                  on_sheet: Optional[Callable[[int, str], None]] = None,
+                  stop: Optional[Callable[[], bool]] = None) -> List[str]:
+    # Πρώτα τα previews όλων των φύλλων ({prefix}_NN_preview.png), μετά τα
+    # κανονικά ({prefix}_NN.png), ώστε η οθόνη να γεμίζει γρήγορα. Τα
+    # callbacks καλούνται από το thread του export, με σειρά φύλλων.
+    # max_px=None: μόνο previews. Επιστρέφει τα paths των κανονικών PNG.
+    os.makedirs(out_dir, exist_ok=True)
+    stopped = lambda: stop is not None and stop()
+
+    def job(sh, path, size, names):
+        return None if stopped() else save_png(sh, path, size, names)
+
+    passes = []
+    if preview_px:
+        passes.append((preview_px, False, "_preview", on_preview))
+    if max_px:
+        passes.append((max_px, True, "", on_sheet))
+    out = []
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for size, names, suffix, cb in passes:
+            futs = [ex.submit(job, sh, os.path.join(out_dir, f"{prefix}_{i:02d}{suffix}.png"),
+                              size, names)
+                    for i, sh in enumerate(sheets, 1)]
+            for i, f in enumerate(futs):
+                path = f.result()
+                if path is None:
+                    continue
+                if cb is not None:
+                    cb(i, path)
+                if names:
+                    out.append(path)
+    return out